@@ -0,0 +1,223 @@
+"""
+Benchmark and physics regression check for the particle velocity solver.
+
+Runs without Streamlit, from the repository root:
+
+    python benchmarks/particle_velocity.py                  # time everything and compare with the golden values
+    python benchmarks/particle_velocity.py --output out.json # also save the results, e.g. as the "before" of a change
+    python benchmarks/particle_velocity.py --update-golden  # re-record the golden values after an intended physics change
+
+Three hot functions are timed per call: get_mach_from_area_ratio, henderson_drag
+and dvp_dx. Three workloads are timed for every gas in GAS_DB and every material in
+MATERIAL_DB:
+- a single exit-velocity solve, with the page's default solver profile;
+- the page's 200-point P0 sweep, as one batched solve;
+- the same sweep sampled adaptively, as the page now does it.
+Every drag correlation in DRAG_MODELS is then compared on the default
+N2/Cu case: the per-element cost of its kernel on a large batch, the time of
+the batched sweep, and the exit velocity it predicts. Finally, batches of
+POOL_BATCH_SIZES default-case sweep points are timed serially and through one
+warm solver_pool worker; the difference is the pool's dispatch overhead, which
+is the measurement to base its batch-size tunables (PARALLEL_MIN_CHUNK) on.
+All workloads start with cold gas-field caches. For each workload the script
+records the best wall time, the number of RHS evaluations and the tracemalloc
+peak. Exit velocities are compared with golden_particle_velocity.json, and the
+exit status is 1 if any of them drifted further than the stored tolerance.
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import tracemalloc
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import particle_solver as ps
+import solver_pool
+from particle_solver import (MATERIAL_DB, GAS_DB, DRAG_MODELS, GasConfig, ParticleConfig, NozzleConfig, SprayConfig,
+                             with_parameter, solve_particle, solve_exit_velocity_batch, profile_for_accuracy)
+from sweep_jobs import adaptive_sweep
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_particle_velocity.json")
+# Exit-velocity tolerances (m/s) against the golden values
+GOLDEN_TOLERANCE = {"reference": 0.01, "sweep": 0.05}
+SWEEP_POINTS = 200
+SWEEP_SAMPLES = (0, 50, 100, 150, 199) # Sweep points stored as golden values
+DRAG_KERNEL_SIZE = 100_000 # Elements per drag-kernel call
+POOL_BATCH_SIZES = (1, 50, 100, 200, 400, 800, 1600)
+
+def default_config(gas_name, material_name):
+    """The page's default inputs: P0 = 30 bar, T0 = 973 K, dp = 20 μm, v0 = 20 m/s, 1.5/5/100 mm nozzle."""
+    gas = GAS_DB[gas_name]
+    return SprayConfig(
+        gas=GasConfig(gamma=gas["Gamma"], R=gas["R"], P0=30e5, T0=973.0),
+        particle=ParticleConfig(rho_p=MATERIAL_DB[material_name]["rho_p"], dp=20e-6, v0=20.0),
+        nozzle=NozzleConfig(Dnt=1.5e-3, De=5e-3, Lf=100e-3),
+    )
+
+def sweep_configs(config):
+    """The page's default sweep: 200 values of P0 between 3/4 and 5/4 of the default."""
+    P0 = config.gas.P0
+    return [with_parameter(config, "P0", val) for val in np.linspace(3*P0/4, 5*P0/4, SWEEP_POINTS)]
+
+def clear_caches():
+    for cached in (ps.get_gas_field, ps.nozzle_mach_profile, ps.nozzle_area_ratio_profile):
+        cached.cache_clear()
+
+def per_call(func, repeat):
+    """Best time per call (s) of a cheap function, timeit-style."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+def run_workload(func, repeat):
+    """Best wall time (s) over repeat cold runs, the tracemalloc peak (bytes) and the last result."""
+    times = []
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    clear_caches()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak, result
+
+def micro_benchmarks(repeat):
+    config = default_config("Nitrogen (N2)", "Copper (Cu)")
+    field = ps.get_gas_field(config.gas, config.nozzle)
+    x = config.nozzle.Lf / 2
+    M, T_gas, rho_gas, v_gas, a_gas, mu_gas = field.at(0.5)
+    vp = 400.0
+    Re_p = rho_gas * abs(v_gas - vp) * config.particle.dp / mu_gas
+    calls = {
+        "get_mach_from_area_ratio": lambda: ps.get_mach_from_area_ratio(x, config.gas, config.nozzle),
+        "henderson_drag": lambda: ps.henderson_drag(Re_p, abs(v_gas - vp) / a_gas, T_gas/2, T_gas, config.gas.gamma),
+        "dvp_dx": lambda: ps.dvp_dx(x, vp, config, field),
+    }
+    return {name: per_call(func, repeat) for name, func in calls.items()}
+
+def solver_benchmarks(repeat):
+    profile = profile_for_accuracy().name
+    rows, values = [], {}
+    for gas_name in GAS_DB:
+        for material_name in MATERIAL_DB:
+            config = default_config(gas_name, material_name)
+            configs = sweep_configs(config)
+            t_single, mem_single, report = run_workload(lambda: solve_particle(config, profile), repeat)
+            t_sweep, mem_sweep, (vp_sweep, sol) = run_workload(lambda: solve_exit_velocity_batch(configs), repeat)
+            evaluate = lambda values: solve_exit_velocity_batch([with_parameter(config, "P0", val) for val in values])[0]
+            t_adaptive, _, (_, _, n_adaptive) = run_workload(lambda: adaptive_sweep(evaluate, configs[0].gas.P0, configs[-1].gas.P0), repeat)
+            case = f"{gas_name} / {material_name}"
+            values[case] = {
+                "reference": solve_particle(config, "reference").vp_exit,
+                "sweep": [float(vp_sweep[i]) for i in SWEEP_SAMPLES],
+            }
+            rows.append({
+                "case": case, "vp_exit": report.vp_exit,
+                "single_ms": 1e3 * t_single, "single_nfev": report.nfev, "single_peak_kB": mem_single / 1024,
+                "sweep_ms": 1e3 * t_sweep, "sweep_nfev": sol.nfev, "sweep_peak_kB": mem_sweep / 1024,
+                "adaptive_ms": 1e3 * t_adaptive, "adaptive_solves": n_adaptive,
+            })
+    return pd.DataFrame(rows), values
+
+def drag_benchmarks(repeat):
+    """Kernel cost, batched sweep time and exit velocities of every drag correlation on the default N2/Cu case."""
+    rng = np.random.default_rng(0)
+    n = DRAG_KERNEL_SIZE
+    # Conditions spanning the nozzle: Re_p 1-1e4, relative Mach number 0-3
+    Re, M_rel, T_g = 10**rng.uniform(0, 4, n), rng.uniform(0, 3, n), rng.uniform(200, 1000, n)
+    base = default_config("Nitrogen (N2)", "Copper (Cu)")
+    rows = []
+    for name, model in DRAG_MODELS.items():
+        config = replace(base, drag=name)
+        configs = sweep_configs(config)
+        t_kernel = per_call(lambda: model.cd(Re, M_rel, T_g/2, T_g, 1.4), repeat)
+        t_sweep, _, (vp_sweep, sol) = run_workload(lambda: solve_exit_velocity_batch(configs), repeat)
+        rows.append({
+            "drag": name, "kernel_ns_per_element": 1e9 * t_kernel / n,
+            "sweep_ms": 1e3 * t_sweep, "sweep_nfev": sol.nfev,
+            "vp_exit": solve_particle(config, "reference").vp_exit,
+            "vp_sweep_min": vp_sweep.min(), "vp_sweep_max": vp_sweep.max(),
+        })
+    return pd.DataFrame(rows)
+
+def pool_benchmarks(repeat):
+    """Serial and single-worker pool time of sweep batches of every POOL_BATCH_SIZES size, and the dispatch overhead."""
+    base = default_config("Nitrogen (N2)", "Copper (Cu)")
+    executor = solver_pool.get_executor()
+    executor.submit(solver_pool._exit_velocity_chunk, [base], 1e-6, 1e-6).result() # Start the worker
+    rows = []
+    for n in POOL_BATCH_SIZES:
+        configs = [with_parameter(base, "P0", val) for val in np.linspace(0.75*base.gas.P0, 1.25*base.gas.P0, n)]
+        t_serial = per_call(lambda: solver_pool._exit_velocity_chunk(configs, 1e-6, 1e-6), repeat)
+        t_pool = per_call(lambda: executor.submit(solver_pool._exit_velocity_chunk, configs, 1e-6, 1e-6).result(), repeat)
+        rows.append({"points": n, "serial_ms": 1e3 * t_serial, "pool_ms": 1e3 * t_pool, "dispatch_ms": 1e3 * (t_pool - t_serial)})
+    solver_pool.shutdown_executor()
+    return pd.DataFrame(rows)
+
+def compare_golden(values, golden):
+    """Rows (case, quantity, value, golden, difference) that drifted beyond the tolerance."""
+    drift = []
+    for case, quantities in values.items():
+        if case not in golden["cases"]:
+            drift.append((case, "missing", np.nan, np.nan, np.nan))
+            continue
+        for quantity, value in quantities.items():
+            expected = np.array(golden["cases"][case][quantity])
+            diff = np.max(np.abs(np.array(value) - expected))
+            if not diff <= golden["tolerance"][quantity]:
+                drift.append((case, quantity, value, expected.tolist(), diff))
+    return drift
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repeats; the best one is reported")
+    parser.add_argument("--output", help="Write the timings and exit velocities to this JSON file")
+    parser.add_argument("--update-golden", action="store_true", help="Overwrite the golden values with this run")
+    args = parser.parse_args(argv)
+
+    micro = micro_benchmarks(args.repeat)
+    print("Per-call times:")
+    for name, seconds in micro.items():
+        print(f"  {name:<26}{1e6 * seconds:9.2f} μs")
+    table, values = solver_benchmarks(args.repeat)
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(table.round(2).to_string(index=False))
+    print(f"Total: single solves {table.single_ms.sum():.0f} ms, sweeps {table.sweep_ms.sum():.0f} ms, adaptive sweeps {table.adaptive_ms.sum():.0f} ms")
+    drag = drag_benchmarks(args.repeat)
+    print("Drag correlations (N2 / Cu):")
+    with pd.option_context("display.width", 200):
+        print(drag.round(2).to_string(index=False))
+    pool = pool_benchmarks(args.repeat)
+    print("Solver pool (one warm worker):")
+    print(pool.round(2).to_string(index=False))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"micro_s": micro, "solver": table.to_dict(orient="records"), "drag": drag.to_dict(orient="records"),
+                       "pool": pool.to_dict(orient="records"), "values": values}, f, indent=1)
+
+    if args.update_golden:
+        with open(GOLDEN_PATH, "w") as f:
+            json.dump({"tolerance": GOLDEN_TOLERANCE, "cases": values}, f, indent=1)
+        print(f"Golden values written to {GOLDEN_PATH}")
+        return 0
+
+    with open(GOLDEN_PATH) as f:
+        drift = compare_golden(values, json.load(f))
+    for case, quantity, value, expected, diff in drift:
+        print(f"DRIFT {case} {quantity}: {value} vs golden {expected} (|diff| = {diff:.3g} m/s)")
+    print("Golden values: " + (f"{len(drift)} drifted" if drift else "all within tolerance"))
+    return 1 if drift else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""
+Material x carrier gas comparison of the particle velocity.
+
+Every selected combination of a MATERIAL_DB powder and a GAS_DB gas, with all
+other inputs as in a base config, is solved in a single cached batch. Optionally
+a sweep of one parameter is solved for each combination in the same batch.
+"""
+from dataclasses import replace
+
+from particle_solver import MATERIAL_DB, GAS_DB, with_parameter
+from solver_cache import cached_exit_velocity_batch
+
+COMPARISON_SWEEP_POINTS = 25 # Points per combination of an overlaid sweep curve
+
+def material_gas_config(config, material_name, gas_name):
+    """Copy of config with the powder density (and specific heat, if heating is on) and the gas of a database entry."""
+    material, gas = MATERIAL_DB[material_name], GAS_DB[gas_name]
+    particle = replace(config.particle, rho_p=material["rho_p"], cp=material["cp"] if config.particle.thermal else None)
+    return replace(config, gas=replace(config.gas, gamma=gas["Gamma"], R=gas["R"]), particle=particle)
+
+def comparison_matrix(config, material_names, gas_names, sweep_name=None, sweep_values=()):
+    """
+    Exit velocity of every material x gas combination, as a (material, gas)
+    array. With sweep_name, also the exit velocity at each of sweep_values, as
+    a (material, gas, value) array (else None). Everything is one batched,
+    cached solve.
+    """
+    bases = [material_gas_config(config, m, g) for m in material_names for g in gas_names]
+    configs = bases + [with_parameter(base, sweep_name, value) for base in bases for value in sweep_values] if sweep_name else bases
+    vp = cached_exit_velocity_batch(configs)
+    shape = (len(material_names), len(gas_names))
+    curves = vp[len(bases):].reshape(*shape, len(sweep_values)) if sweep_name else None
+    return vp[:len(bases)].reshape(shape), curves
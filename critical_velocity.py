@@ -0,0 +1,94 @@
+"""
+Critical velocity models for cold spray deposition and the material data they use.
+
+Shared by the Critical Velocity Calculator page and the particle velocity tools,
+which compare predicted particle velocities with these models.
+"""
+import numpy as np
+
+MATERIAL_DB = {
+    "Copper (Cu)": {
+        "rho": 8.96,  # Density (g/cm³)
+        "Tm": 1083,   # Melting Temp (°C)
+        "Cp": 384, # Specific Heat Capacity (J/Kg per K)
+        "B": 140, # Bulk Modulus (GPA)
+        "su_default": 220,  # Ultimate Strength (MPa) - Default
+        "Ti_default": 320,  # Initial Temp (°C) - Default
+        "Tp_default": 26.85, # Particle Imact Temp (°C) - Default
+        "d_default": 20, # Particle Diameter (μm) - Default
+        "dref_default": 10, # Reference Particle Diameter (μm) - Default
+        #"k1_default": 0.6, #A particle-size-dependent fitting parameter, used in vcr formula (Dimensionless) - Default
+        "gamma_default": 230, #A material-dependent model parameter that incorporates correlation between spall strength and tensile strength (μm^0.19) - Default
+    },
+    "Aluminum (Al)": { 
+        "rho": 2.70,  # Density (g/cm³)
+        "Tm": 660,    # Melting Temp (°C)
+        "Cp": 890, # Specific Heat Capacity (J/Kg per K)
+        "B": 75, # Bulk Modulus (GPA)
+        "su_default": 110,   # Ultimate Strength (MPa) - Default
+        "Ti_default": 20,    # Initial Temp (°C) - Default
+        "Tp_default": 0.0, # Particle Imact Temp (°C) - Default
+        "d_default": 20, # Particle Diameter (μm) - Default
+        "dref_default": 10, # Reference Particle Diameter (μm) - Default
+        "k1_default": 0.55, # A particle-size-dependent fitting parameter, used in vcr formula (Dimensionless) - Default
+        "gamma_default": 230, #A material-dependent model parameter that incorporates correlation between spall strength and tensile strength (μm^0.19) - Default
+    }
+}
+
+# --- Critical Velocity Calculation Functions ---
+# All arguments may be NumPy arrays, which broadcast against each other
+def calculate_critical_velocity_1(rho, Tm, su, Ti):
+    """
+    Calculates critical velocity (v_cr) in m/s using the formula:
+    v_cr = 667 - 14*rho + 0.08*Tm + 0.1*su - 0.4*Ti
+    where units are: rho (g/cm³), Tm (°C), su (MPa), Ti (°C)
+    """
+    
+    v_cr = 667 - (14 * rho) + (0.08 * Tm) + (0.1 * su) - (0.4 * Ti)
+    return v_cr
+
+def calculate_critical_velocity_2(k1, Cp, rho, Tm, Tp, su):
+    """
+    Calculates critical velocity (v_cr) in m/s using the formula:
+    v_cr = k1*sqrt(Cp*(Tm-Tp) + 16*su/rho*((Tm - Tp)/(Tm - 293)))
+    where units are: Cp (J/kg per K), rho (Kg/m³), Tm (K), su (Pa), Tp (K), k1 (dimensionless)
+    """
+    
+    v_cr = k1*np.sqrt(Cp*((Tm + 273.15) - (Tp + 273.15)) + 16*((su*1000000)/(rho*1000))*(((Tm + 273.15) - (Tp + 273.15))/((Tm + 273.15) - 293)))
+    return v_cr
+
+def calculate_critical_velocity_3(gamma, su, B, rho, Tm, Tp, d):
+    """
+    Calculates critical velocity (v_cr) in m/s using the formula:
+    v_cr = gamma*(su/B)*sqrt(B/(rho*1000))*(((Tm - Tp)/(Tm - 20.0))^0.5)*(1/(d^0.19))
+    where units are: gamma (μm^0.19), su (MPa), B (GPa), rho (Kg/m³), Tm (°C) , Tp (°C), d (μm)
+    """
+    
+    #v_cr = gamma*(su/B)*math.sqrt(B/(rho*1000))*(((Tm - Tp)/(Tm - 20))**0.5)*(1/(d**0.19))
+    v_cr = gamma*((su*10**6)/(B*10**9))*np.sqrt((B*10**9)/(rho*1000))*(((Tm - Tp)/(Tm - 20))**0.5)*(d**(-0.19))
+    
+    return v_cr
+
+def calculate_k1(d, dref):
+    return 0.64*(d/dref)**(-0.18)
+
+CRITICAL_VELOCITY_MODELS = ("Assadi et al. (2003)", "Assadi et al. (2011)", "Zhang et al. (2025)")
+
+def critical_velocities(material_name, d, Tp=None, Ti=None, su=None, dref=None, gamma=None):
+    """
+    Critical velocity (m/s) of every model for particle diameters d (μm), keyed by
+    CRITICAL_VELOCITY_MODELS. Parameters left as None take the material defaults;
+    d and Tp (°C) may be arrays of the same shape.
+    """
+    m = MATERIAL_DB[material_name]
+    Tp = m["Tp_default"] if Tp is None else Tp
+    Ti = m["Ti_default"] if Ti is None else Ti
+    su = m["su_default"] if su is None else su
+    dref = m["dref_default"] if dref is None else dref
+    gamma = m["gamma_default"] if gamma is None else gamma
+    d, Tp = np.broadcast_arrays(np.asarray(d, dtype=float), np.asarray(Tp, dtype=float))
+
+    vcr1 = calculate_critical_velocity_1(m["rho"], m["Tm"], su, Ti)
+    vcr2 = calculate_critical_velocity_2(calculate_k1(d, dref), m["Cp"], m["rho"], m["Tm"], Tp, su)
+    vcr3 = calculate_critical_velocity_3(gamma, su, m["B"], m["rho"], m["Tm"], Tp, d)
+    return dict(zip(CRITICAL_VELOCITY_MODELS, (np.full(d.shape, vcr1), vcr2, vcr3)))
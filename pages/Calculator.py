@@ -1,10 +1,11 @@
 import streamlit as st
 import os
-import math
 import numpy as np
 import matplotlib.pyplot as plt
 from rdflib import Graph
 import pandas as pd
+from critical_velocity import (MATERIAL_DB, calculate_critical_velocity_1, calculate_critical_velocity_2,
+                               calculate_critical_velocity_3, calculate_k1)
 
 # --- Streamlit UI Setup ---
 current_dir = os.path.dirname(__file__)
@@ -74,71 +75,6 @@ with left:
 
 st.image(uni_path, width=600, output_format="auto")
 
-MATERIAL_DB = {
-    "Copper (Cu)": {
-        "rho": 8.96,  # Density (g/cm³)
-        "Tm": 1083,   # Melting Temp (°C)
-        "Cp": 384, # Specific Heat Capacity (J/Kg per K)
-        "B": 140, # Bulk Modulus (GPA)
-        "su_default": 220,  # Ultimate Strength (MPa) - Default
-        "Ti_default": 320,  # Initial Temp (°C) - Default
-        "Tp_default": 26.85, # Particle Imact Temp (°C) - Default
-        "d_default": 20, # Particle Diameter (μm) - Default
-        "dref_default": 10, # Reference Particle Diameter (μm) - Default
-        #"k1_default": 0.6, #A particle-size-dependent fitting parameter, used in vcr formula (Dimensionless) - Default
-        "gamma_default": 230, #A material-dependent model parameter that incorporates correlation between spall strength and tensile strength (μm^0.19) - Default
-    },
-    "Aluminum (Al)": { 
-        "rho": 2.70,  # Density (g/cm³)
-        "Tm": 660,    # Melting Temp (°C)
-        "Cp": 890, # Specific Heat Capacity (J/Kg per K)
-        "B": 75, # Bulk Modulus (GPA)
-        "su_default": 110,   # Ultimate Strength (MPa) - Default
-        "Ti_default": 20,    # Initial Temp (°C) - Default
-        "Tp_default": 0.0, # Particle Imact Temp (°C) - Default
-        "d_default": 20, # Particle Diameter (μm) - Default
-        "dref_default": 10, # Reference Particle Diameter (μm) - Default
-        "k1_default": 0.55, # A particle-size-dependent fitting parameter, used in vcr formula (Dimensionless) - Default
-        "gamma_default": 230, #A material-dependent model parameter that incorporates correlation between spall strength and tensile strength (μm^0.19) - Default
-    }
-}
-
-# --- Critical Velocity Calculation Functions ---
-def calculate_critical_velocity_1(rho, Tm, su, Ti):
-    """
-    Calculates critical velocity (v_cr) in m/s using the formula:
-    v_cr = 667 - 14*rho + 0.08*Tm + 0.1*su - 0.4*Ti
-    where units are: rho (g/cm³), Tm (°C), su (MPa), Ti (°C)
-    """
-    
-    v_cr = 667 - (14 * rho) + (0.08 * Tm) + (0.1 * su) - (0.4 * Ti)
-    return v_cr
-
-def calculate_critical_velocity_2(k1, Cp, rho, Tm, Tp, su):
-    """
-    Calculates critical velocity (v_cr) in m/s using the formula:
-    v_cr = k1*sqrt(Cp*(Tm-Tp) + 16*su/rho*((Tm - Tp)/(Tm - 293)))
-    where units are: Cp (J/kg per K), rho (Kg/m³), Tm (K), su (Pa), Tp (K), k1 (dimensionless)
-    """
-    
-    v_cr = k1*math.sqrt(Cp*((Tm + 273.15) - (Tp + 273.15)) + 16*((su*1000000)/(rho*1000))*(((Tm + 273.15) - (Tp + 273.15))/((Tm + 273.15) - 293)))
-    return v_cr
-
-def calculate_critical_velocity_3(gamma, su, B, rho, Tm, Tp, d):
-    """
-    Calculates critical velocity (v_cr) in m/s using the formula:
-    v_cr = gamma*(su/B)*sqrt(B/(rho*1000))*(((Tm - Tp)/(Tm - 20.0))^0.5)*(1/(d^0.19))
-    where units are: gamma (μm^0.19), su (MPa), B (GPa), rho (Kg/m³), Tm (°C) , Tp (°C), d (μm)
-    """
-    
-    #v_cr = gamma*(su/B)*math.sqrt(B/(rho*1000))*(((Tm - Tp)/(Tm - 20))**0.5)*(1/(d**0.19))
-    v_cr = gamma*((su*10**6)/(B*10**9))*math.sqrt((B*10**9)/(rho*1000))*(((Tm - Tp)/(Tm - 20))**0.5)*(d**(-0.19))
-    
-    return v_cr
-
-def calculate_k1(d, dref):
-    return 0.64*(d/dref)**(-0.18)
-
 # 1. Material Selection
 st.sidebar.header("Parameter Selection")
 material_name = st.sidebar.selectbox(
@@ -184,7 +120,7 @@ Tp = st.sidebar.slider(
     min_value=20.0, 
     max_value=500.0, 
     value=Tp_default,
-    help="Higher impact temperature decreases the critical velocity."
+    help="Higher impact temperature decreases the critical velocity. The Particle Velocity page computes it from the nozzle conditions with Particle heating switched on."
 )
 
 # Ultimate Strength (su)
@@ -319,16 +255,12 @@ var_range = st.slider(f"Select a range of values for {variables_text[var_text]}"
 var_min, var_max = var_range
 x = np.linspace(var_min, var_max, 200)
 
-vcr1_vals = []
-vcr2_vals = []
-vcr3_vals = []
-
-for val in x:
-    variables[var_text] = val
-    k1 = calculate_k1(variables["d"], st.session_state.dref)
-    vcr1_vals.append(calculate_critical_velocity_1(variables["ρ"], variables["Tm"], variables["σu"], variables["Ti"]))
-    vcr2_vals.append(calculate_critical_velocity_2(k1, variables["Cp"], variables["ρ"], variables["Tm"], variables["Tp"], variables["σu"]))
-    vcr3_vals.append(calculate_critical_velocity_3(variables["γ"], variables["σu"], variables["B"], variables["ρ"], variables["Tm"], variables["Tp"], variables["d"]))
+# Every model evaluated over the whole range at once
+variables[var_text] = x
+k1 = calculate_k1(variables["d"], st.session_state.dref)
+vcr1_vals = np.broadcast_to(calculate_critical_velocity_1(variables["ρ"], variables["Tm"], variables["σu"], variables["Ti"]), x.shape)
+vcr2_vals = np.broadcast_to(calculate_critical_velocity_2(k1, variables["Cp"], variables["ρ"], variables["Tm"], variables["Tp"], variables["σu"]), x.shape)
+vcr3_vals = np.broadcast_to(calculate_critical_velocity_3(variables["γ"], variables["σu"], variables["B"], variables["ρ"], variables["Tm"], variables["Tp"], variables["d"]), x.shape)
 
 fig, ax = plt.subplots()
 ax.plot(x, vcr1_vals, "b", label = "Assadi et al. (2003)[1]")
@@ -4,10 +4,25 @@ import math
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from scipy.integrate import solve_ivp
-from scipy.optimize import fsolve
-from scipy.optimize import brentq
-import sympy as sp
+import matplotlib.colors as mcolors
+from particle_solver import (MATERIAL_DB, GAS_DB, DRAG_MODELS, DEFAULT_DRAG_MODEL, GasConfig, ParticleConfig, NozzleConfig, SprayConfig,
+                             with_parameter, SOLVER_PROFILES, STIFF_METHODS, INTERACTIVE_ACCURACY, profile_for_accuracy)
+from solver_cache import get_cache, cached_solve_particle, cached_exit_velocity_batch, cached_exit_state_batch, cached_nozzle_profiles, cached_sensitivities
+from size_distribution import PSD_KINDS, distribution_classes, histogram_classes, to_mass_weights, depositing_fraction
+import critical_velocity as cv
+from critical_velocity import CRITICAL_VELOCITY_MODELS
+from process_design import DESIGN_PARAMETERS, DESIGN_BOUNDS, solve_for_target
+import solver_metrics
+from sweep_jobs import SweepJob, GridJob, SWEEP_POLL_INTERVAL, SWEEP_TOLERANCE
+from spray_window import WINDOW_PARAMETERS, exit_state_grid, velocity_ratio
+from comparison import COMPARISON_SWEEP_POINTS, comparison_matrix
+from uncertainty import UNCERTAIN_PARAMETERS, SAMPLING_METHODS, INPUT_DISTRIBUTIONS, MC_PERCENTILES, monte_carlo_exit_velocity, summarize
+from surrogate import load_surrogate
+from paper_predictions import predict_papers, reported_critical_velocities
+
+# Solver counters and timers for this rerun, switched on in the sidebar (or by default with COLDSPRAY_METRICS=1)
+diagnostics_default = os.environ.get("COLDSPRAY_METRICS") == "1"
+metrics = solver_metrics.start(st.session_state.get("solver_diagnostics", diagnostics_default))
 
 # --- Streamlit UI Setup ---
 current_dir = os.path.dirname(__file__)
@@ -71,177 +86,6 @@ with col4:
 
 st.image(uni_path, width=600, output_format="auto")
 
-MATERIAL_DB = {
-    "Copper (Cu)": {
-        "rho_p": 8960.0,  # Particle Density (Kg/m³)
-    },
-    "Aluminum (Al)": { 
-        "rho_p": 2700.0,  # Particle Density (Kg/m³)
-    },
-    "Iron (Fe)": { 
-        "rho_p": 7870.0,  # Density (Kg/cm³)
-    },
-    "Magnesium (Mg)": { 
-        "rho_p": 1740.0,  # Density (Kg/cm³)
-    },
-    "Nickel (Ni)": { 
-        "rho_p": 8910.0,  # Density (Kg/cm³)
-    },
-    "Titanium (Ti)": { 
-        "rho_p": 4510.0,  # Density (Kg/cm³)
-    },
-    "Custom Material": { 
-        "rho_p": 2700.0,  # Density (Kg/cm³)
-    },
-}
-
-GAS_DB = {
-    "Nitrogen (N2)": {
-        "Gamma": 1.4,  # Ratio of specific heats
-        "R": 296.8,   # Gas constant for Nitrogen (J/kg·K)
-    },
-    "Helium (He)": {
-        "Gamma": 1.67,  # Ratio of specific heats
-        "R": 2077.1,   # Gas constant for Nitrogen (J/kg·K)
-    },
-    "Argon (Ar)": {
-        "Gamma": 1.67,  # Ratio of specific heats
-        "R": 208.0,   # Gas constant for Nitrogen (J/kg·K)
-    },
-    "Hydrogen (H2)": {
-        "Gamma": 1.41,  # Ratio of specific heats
-        "R": 4124.0,   # Gas constant for Nitrogen (J/kg·K)
-    },
-    "Air": {
-        "Gamma": 1.4,  # Ratio of specific heats
-        "R": 287.1,   # Gas constant for Nitrogen (J/kg·K)
-    },
-}
-
-###External functions###
-####################################
-#Functions
-
-def get_viscosity(T):
-    """Sutherland's Law for Nitrogen viscosity."""
-    mu0 = 1.781e-5
-    S = 111.0
-    return mu0 * (T / 288.15)**1.5 * (288.15 + S) / (T + S)
-
-
-def henderson_drag(Re, M_rel, T_p, T_g):
-    """
-    Henderson's Drag Coefficient Correlation (1976) for all 3 regimes.
-    Note: These formulas are not in the sources and should be verified.
-    """
-    if Re < 1e-6: return 0.44 # Default for very high Re/low viscosity
-    
-    S = M_rel * np.sqrt(gamma / 2.0) # Molecular speed ratio
-    
-    # 1. Subsonic Regime (M_rel < 1.0)
-    def cd_subsonic(Re_val, M_val, S_val):
-        term1 = 24.0 / (Re_val + S_val * (4.33 + (3.65 - 1.53 * T_p / T_g) / (1.0 + 0.353 * T_p / T_g) * np.exp(-0.247 * Re_val / S_val)))
-        term2 = np.exp(-0.5 * M_val / np.sqrt(Re_val)) * ((4.5 + 0.38 * (0.03 * Re_val + 0.48 * np.sqrt(Re_val))) / (1.0 + 0.03 * Re_val + 0.48 * np.sqrt(Re_val)) + 0.1 * M_val**2 + 0.2 * M_val**8)
-        term3 = (1.0 - np.exp(-M_val / Re_val)) * 0.6 * S_val
-        return term1 + term2 + term3
-
-    # 2. Supersonic Regime (M_rel >= 1.75)
-    def cd_supersonic(Re_val, M_val, S_val):
-        term1 = (0.9 + 0.34 / (M_val**2) + 1.86 * np.sqrt(M_val / Re_val) * (2.0 + 2.0/(S_val**2) + 1.058/S_val * np.sqrt(T_p/T_g) - 1.0/(S_val**4)))
-        term2 = 1.0 + 1.86 * np.sqrt(M_val / Re_val)
-        return term1 / term2
-
-    # Logic for Mach Number Ranges
-    if M_rel < 1.0:
-        return cd_subsonic(Re, M_rel, S)
-    elif M_rel >= 1.75:
-        return cd_supersonic(Re, M_rel, S)
-    else:
-        # 3. Transonic/Transition Regime (1.0 <= M_rel < 1.75)
-        # Linear interpolation between M=1.0 and M=1.75
-        cd_1 = cd_subsonic(Re, 1.0, 1.0 * np.sqrt(gamma / 2.0))
-        cd_175 = cd_supersonic(Re, 1.75, 1.75 * np.sqrt(gamma / 2.0))
-        return cd_1 + (M_rel - 1.0) / 0.75 * (cd_175 - cd_1)
-    
-
-
-
-###Particle Velocity Calculations###
-####################################
-#Functions
-
-linear_or_custom = "Linear"
-#Calculating supersonic Mach number M based on local area A(x)
-def get_mach_from_area_ratio(x_val):
-
-    # Assuming a linear divergent nozzle for area calculation
-    D_local = Dnt + (De - Dnt) * (x_val / Lf)
-    A_local = np.pi * (D_local/2)**2
-    area_ratio = A_local / At
-
-    # Isentropic Area-Mach Relation
-    def equation(M):
-        if M <= 0: return 1e6
-        term = (2 / (gamma + 1)) * (1 + (gamma - 1) / 2 * M**2)
-        exponent = (gamma + 1) / (2 * (gamma - 1))
-        return (1/M) * (term**exponent) - area_ratio
-
-    # Solve for M > 1 (supersonic branch for divergent section) [3]
-    #for fsolve
-    #if x_val < Lf/2:
-    #    initial_guess = 0.5  # subsonic near throat
-    #else:
-    #    initial_guess = 2.0 
-        # Automatic branch selection
-    if area_ratio < 1:
-        # Subsonic: M < 1
-        a, b = 1e-6, 1.0
-    else:
-        # Supersonic: M > 1
-        a, b = 1.0, 5.0
-        # expand upper bound if necessary
-        res_a, res_b = equation(a), equation(b)
-        if res_a * res_b > 0:
-            for b_try in np.linspace(5.0, 20.0, 4):
-                if equation(b_try) * res_a < 0:
-                    b = b_try
-                    break
-            else:
-                return np.nan  # no root found
-
-    return brentq(equation, a, b, maxiter=100)
-
-#Calculating gas state-Returns local gas density (rho) and temperature (T) 
-def get_gas_state(M):
-
-    T = T0 / (1 + (gamma - 1) / 2 * M**2)
-    P = P0 / (1 + (gamma - 1) / 2 * M**2)**(gamma / (gamma - 1))
-    rho = P / (R * T)
-    #vgx = M * np.sqrt(gamma * R * T)
-    return rho, T
-
-#Governing differential equation-The ODE based on Newton's Second Law
-def dvp_dx(x, vp):
-    
-    if vp <= 0: return 1e-6 
-    
-    M = get_mach_from_area_ratio(x)
-    rho_gas, T_gas = get_gas_state(M)
-    v_gas = M * np.sqrt(gamma * R * T_gas)
-    mu_gas = get_viscosity(T_gas)
-    v_rel = np.abs(v_gas - vp)
-    Re_p = (rho_gas * v_rel * dp) / mu_gas
-    M_rel = v_rel / np.sqrt(gamma * R * T_gas)
-    #Cd = 0.44 # Drag Coefficient (Cd)
-    Cd = henderson_drag(Re_p, M_rel, 1/2*T_gas, T_gas)
-    
-    acceleration = (Cd * rho_gas * Ap) / (2 * mp * vp) * (v_gas - vp)**2
-    return acceleration
-
-####################################
-####################################
-
-
 #Material Selection
 st.sidebar.header("Parameter Selection")
 material_name = st.sidebar.selectbox(
@@ -315,63 +159,89 @@ dp = st.sidebar.slider(
 )
 
 dp = dp*1e-6
-mp = rho_p * (4/3) * np.pi * (dp/2)**3  # Particle mass (Kg)
-Ap = np.pi * (dp/2)**2 # Particle projected area
 
 # Select nozzle geometry in the sidebar
 
-#st.sidebar.markdown(f"**Nozzle Geometry:**")
+st.sidebar.markdown(f"**Nozzle Geometry:**")
 
 # Nozzle throat diameter (m)
-#linear_or_custom = st.sidebar.selectbox(
-#    "Nozzle Geometry",
-#    ["Linear", "Custom Geometry"]
-#)
-if linear_or_custom == "Custom Geometry":
-    function_string = st.sidebar.text_input("Enter the function describing the nozzle geometry:", help="""Write the equation using Python syntax with "x" for the longitudinal coordinate and "L" for the length of the divergent part of the nozzle.""")
-    x, L = sp.symbols('x L')
-
-    f_geom = None
-    if function_string:
-        try:
-            expr = sp.sympify(
-            function_string,
-            locals={"x": x, "L": L}
-        )
-            f_geom = sp.lambdify((x, L), expr, "numpy")
-
-        except Exception as e:
-            st.error(f"Invalid expression: {e}")
-            st.stop()
-
-Dnt = st.sidebar.slider(
-    "Nozzle Throat Diameter ($D_nt$) in mm:", 
-    min_value=1.0, 
-    max_value=4.0, 
-    value=Dnt_default
+linear_or_custom = st.sidebar.selectbox(
+    "Nozzle Geometry",
+    ["Linear", "Custom Geometry", "Profile Table"]
 )
 
-Dnt = Dnt*1e-3
+if linear_or_custom == "Linear":
+    Dnt = st.sidebar.slider(
+        "Nozzle Throat Diameter ($D_nt$) in mm:", 
+        min_value=1.0, 
+        max_value=4.0, 
+        value=Dnt_default
+    )
+
+    Dnt = Dnt*1e-3
 
-De = st.sidebar.slider(
-    "Nozzle Exit Diameter ($D_e$) in mm:", 
-    min_value=4.0, 
-    max_value=20.0, 
-    value=De_default
-)
+    De = st.sidebar.slider(
+        "Nozzle Exit Diameter ($D_e$) in mm:", 
+        min_value=4.0, 
+        max_value=20.0, 
+        value=De_default
+    )
 
-De = De*1e-3
+    De = De*1e-3
 
-Lf = st.sidebar.slider(
-    "Length of divergent region ($L_f$) in mm:", 
-    min_value=40.0, 
-    max_value=300.0, 
-    value=Lf_default
-)
+if linear_or_custom != "Profile Table":
+    Lf = st.sidebar.slider(
+        "Length of divergent region ($L_f$) in mm:", 
+        min_value=40.0, 
+        max_value=300.0, 
+        value=Lf_default
+    )
 
-Lf = Lf*1e-3
+    Lf = Lf*1e-3
 
-At = np.pi * (Dnt/2)**2 # Throat area (A*)
+# The custom geometry is compiled and sampled once per expression/profile (cached in particle_solver)
+if linear_or_custom == "Linear":
+    nozzle = NozzleConfig(Dnt=Dnt, De=De, Lf=Lf)
+elif linear_or_custom == "Custom Geometry":
+    function_string = st.sidebar.text_input(
+        "Enter the function describing the nozzle diameter in mm:",
+        value=f"{Dnt_default} + ({De_default} - {Dnt_default})*x/L",
+        help="""Write the equation using Python syntax with "x" for the longitudinal coordinate and "L" for the length of the divergent part of the nozzle, both in mm. The throat is at x = 0. Allowed are numbers, x, L, pi, + - * / ** and the functions sqrt, exp, log, sin, cos, tan, tanh, abs, min and max. The diameter must be finite and positive at the throat and the exit."""
+    )
+    try:
+        nozzle = NozzleConfig.from_expression(function_string, Lf)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+else:
+    profile_file = st.sidebar.file_uploader(
+        "Upload the nozzle profile (CSV):", type=["csv"],
+        help="Two numeric columns: axial position x and diameter D, both in mm, with x strictly increasing from the throat. An optional first row of column names is skipped; further columns are ignored."
+    )
+    if profile_file is None:
+        st.info("Upload a nozzle profile in the sidebar to calculate the particle velocity.")
+        st.stop()
+    try:
+        profile = pd.read_csv(profile_file, header=None)
+        if profile.shape[1] < 2:
+            raise ValueError("expected two columns, x and D, separated by commas.")
+        profile = profile.iloc[:, :2].apply(pd.to_numeric, errors="coerce")
+        if profile.iloc[0].isna().any():
+            profile = profile.iloc[1:] # Header row
+        if profile.isna().any().any():
+            raise ValueError("all x and D values must be numbers.")
+        profile = profile.to_numpy(dtype=float)
+        nozzle = NozzleConfig.from_profile(profile[:, 0]*1e-3, profile[:, 1]*1e-3)
+    except ValueError as e:
+        st.error(f"Invalid profile: {e}")
+        st.stop()
+
+Dnt, De, Lf = nozzle.Dnt, nozzle.De, nozzle.Lf
+if linear_or_custom != "Linear":
+    st.sidebar.metric("Throat Diameter ($D_{nt}$)", f"{Dnt*1e3:.2f} mm")
+    st.sidebar.metric("Exit Diameter ($D_e$)", f"{De*1e3:.2f} mm")
+    if linear_or_custom == "Profile Table":
+        st.sidebar.metric("Length of divergent region ($L_f$)", f"{Lf*1e3:.1f} mm")
 
 v0 = st.sidebar.slider(
     "Particle velocity at throat (x=0) ($V_0$) in m/s:", 
@@ -380,21 +250,249 @@ v0 = st.sidebar.slider(
     value=v0_default
 )
 
+# Particle temperature, integrated with the velocity when switched on
+particle_heating = st.sidebar.toggle(
+    "Particle heating",
+    value=False,
+    help="Solve the particle temperature together with the velocity (Ranz-Marshall convection from the gas). "
+         "The impact temperature then feeds the temperature-dependent critical velocity models."
+)
+cp = None
+T_init = 293.15
+if particle_heating:
+    if material_name != "Custom Material":
+        cp = material_data["cp"]
+        st.sidebar.metric("Particle Specific Heat ($c_p$)", f"{cp} J/kg·K")
+    else:
+        cp = st.sidebar.slider(
+        "Particle Specific Heat ($c_p$) in J/kg·K:",
+        min_value=100.0,
+        max_value=2000.0,
+        value=material_data["cp"],
+        )
+    T_init = st.sidebar.slider(
+        "Particle temperature at throat ($T_{p,0}$) in K:",
+        min_value=273.0,
+        max_value=1073.0,
+        value=293.0,
+    )
+
+# Solver accuracy/speed
+st.sidebar.markdown(f"**Solver:**")
+solver_profiles = list(SOLVER_PROFILES)
+solver_profile = st.sidebar.selectbox(
+    "Solver accuracy",
+    solver_profiles,
+    index=solver_profiles.index(profile_for_accuracy(INTERACTIVE_ACCURACY).name),
+    format_func=lambda name: f"{name.capitalize()} (±{SOLVER_PROFILES[name].accuracy} m/s)",
+    help="Preview is the cheapest mode meeting the interactive accuracy; Reference uses tight tolerances and keeps the dense solution."
+)
+solver_method = st.sidebar.selectbox(
+    "Integration method",
+    ["Automatic", *STIFF_METHODS],
+    help="Implicit methods (Radau, BDF) or LSODA can be faster for small particles, where the drag term is stiff."
+)
+drag_models = list(DRAG_MODELS)
+drag = st.sidebar.selectbox(
+    "Drag correlation",
+    drag_models,
+    index=drag_models.index(DEFAULT_DRAG_MODEL),
+    help="\n\n".join(f"**{name}**: {model.description}" for name, model in DRAG_MODELS.items())
+)
+live_preview = st.sidebar.toggle(
+    "Live preview",
+    value=False,
+    help="Show the exit velocity from the precomputed surrogate while adjusting the sliders, and skip the analyses below. "
+         "Inputs outside the surrogate's validated domain (e.g. custom geometries, another drag correlation or particle heating) are always solved exactly."
+)
+st.sidebar.toggle(
+    "Solver diagnostics",
+    value=diagnostics_default,
+    key="solver_diagnostics",
+    help="Count calls and time spent in the solver functions on every rerun, shown at the bottom of the page and written to the log."
+)
+
 
 #Solution
 
-x_span = (0, Lf) # Integrate from throat to exit
+config = SprayConfig(
+    gas=GasConfig(gamma=gamma, R=R, P0=P0, T0=T0),
+    particle=ParticleConfig(rho_p=rho_p, dp=dp, v0=v0, cp=cp, T_init=T_init),
+    nozzle=nozzle,
+    drag=drag,
+)
 
-sol = solve_ivp(dvp_dx, x_span, [v0], t_eval=np.linspace(0, Lf, 100))
+surrogate = load_surrogate()
+if live_preview and surrogate is not None and surrogate.covers(config):
+    # Sub-millisecond interpolation in the precomputed table; the exact solve only on request
+    st.divider()
+    st.markdown(f"#### Calculated Particle Velocity based on Alonso et al. (2023)[1]")
+    st.metric(
+        "Particle Velocity at Exit($\mathbf{v_{p}}$), live preview",
+        f"≈ {surrogate.predict(config):.0f} m/s"
+    )
+    st.caption(f"Surrogate model, within ±{surrogate.error_bound(config):.1f} m/s of the solver over the slider ranges. "
+               "Switch off the live preview in the sidebar for the profiles and analyses.")
+    if st.button("Solve exactly"):
+        report = cached_solve_particle(config, solver_profile, None if solver_method == "Automatic" else solver_method)
+        st.metric("Particle Velocity at Exit, exact", f"{report.vp_exit:.2f} m/s")
+        st.caption(f"{report.profile.capitalize()} solve ({report.method}): {report.nfev} RHS evaluations, estimated error ±{report.error_estimate:.2g} m/s")
+    st.stop()
+
+try:
+    report = cached_solve_particle(config, solver_profile, None if solver_method == "Automatic" else solver_method)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+
+vp_exit = report.vp_exit
 
 #Output
-#print(f"Final Particle Velocity at Exit: {sol.y[-1, -1]:.2f} m/s")
+#print(f"Final Particle Velocity at Exit: {vp_exit:.2f} m/s")
 st.divider()
 st.markdown(f"#### Calculated Particle Velocity based on Alonso et al. (2023)[1]")
 st.metric(
     "Particle Velocity at Exit($\mathbf{v_{p}}$)", 
-    f"{sol.y[-1, -1]:.2f} m/s"
+    f"{vp_exit:.2f} m/s"
 )
+st.caption(f"{report.profile.capitalize()} solve ({report.method}): {report.nfev} RHS evaluations, estimated error ±{report.error_estimate:.2g} m/s")
+
+# Impact temperature from the same solve, fed into the temperature-dependent critical velocity models
+if report.Tp_exit is not None:
+    Tp_exit = report.Tp_exit
+    st.metric("Particle Temperature at Exit ($\mathbf{T_{p}}$)", f"{Tp_exit:.0f} K ({Tp_exit - 273.15:.0f} °C)")
+    if material_name in cv.MATERIAL_DB:
+        vcr_impact = cv.critical_velocities(material_name, dp*1e6, Tp=Tp_exit - 273.15)
+        for (model, vcr), col in zip(vcr_impact.items(), st.columns(len(vcr_impact))):
+            with col:
+                st.metric(f"$v_{{cr}}$, {model}", f"{float(vcr):.0f} m/s", delta=f"{vp_exit - float(vcr):+.0f} m/s margin", delta_color="normal")
+        st.caption(f"Critical velocities at the exit temperature and $d_p$ = {dp*1e6:.0f} μm. {CRITICAL_VELOCITY_MODELS[0]} does not depend on the impact temperature; "
+                   "the other inputs are the Critical Velocity Calculator defaults.")
+    else:
+        st.info("Critical velocity data is only available for the materials of the Critical Velocity Calculator.")
+if live_preview and surrogate is None:
+    st.caption("Live preview is not available: the surrogate table is missing or was built for another solver version (rebuild it with `python surrogate.py`); solved exactly.")
+elif live_preview:
+    st.caption("Live preview is not available for these inputs (custom geometry, drag correlation, particle heating or outside the slider ranges); solved exactly.")
+
+#--------------------------Profiles along the nozzle
+st.markdown("\n\n")
+st.divider()
+st.markdown(f"#### Profiles Along the Nozzle")
+
+# One dense solve; the gas and drag profiles are evaluated from the same gas field as the integration
+profiles = cached_nozzle_profiles(config, solver_profile, None if solver_method == "Automatic" else solver_method)
+x_mm = profiles["x"] * 1e3
+
+fig, (ax_v, ax_m, ax_t) = plt.subplots(3, 1, sharex=True, figsize=(6.4, 7.2))
+ax_v.plot(x_mm, profiles["vp"], "b", label="Particle")
+ax_v.plot(x_mm, profiles["v_gas"], "r--", label="Gas")
+ax_v.set_ylabel("Velocity (m/s)")
+ax_v.legend(loc="lower right", fontsize="small")
+ax_m.plot(x_mm, profiles["M"], "r--", label="Gas Mach number")
+ax_m.plot(x_mm, profiles["M_rel"], "k", label="Relative Mach number")
+ax_m.set_ylabel("Mach number")
+ax_m.legend(loc="upper left", fontsize="small")
+ax_t.plot(x_mm, profiles["T_gas"], "r--", label="Gas")
+if particle_heating:
+    ax_t.plot(x_mm, profiles["Tp"], "b", label="Particle")
+    ax_t.legend(loc="upper right", fontsize="small")
+ax_t.set_ylabel("Temperature (K)")
+ax_cd = ax_t.twinx()
+ax_cd.plot(x_mm, profiles["Cd"], "g")
+ax_cd.set_ylabel("Drag coefficient $C_d$", color="g")
+ax_t.set_xlabel("x (mm)")
+ax_v.set_title("Particle and Gas State Along the Divergent Section")
+fig.tight_layout()
+
+with solver_metrics.timer("matplotlib"):
+    st.pyplot(fig)
+
+profile_table = pd.DataFrame({
+    "x (mm)": x_mm,
+    "D (mm)": profiles["D"] * 1e3,
+    "Particle velocity (m/s)": profiles["vp"],
+    "Gas velocity (m/s)": profiles["v_gas"],
+    "Mach number": profiles["M"],
+    "Gas temperature (K)": profiles["T_gas"],
+    "Gas density (Kg/m³)": profiles["rho_gas"],
+    "Relative Mach number": profiles["M_rel"],
+    "Particle Reynolds number": profiles["Re_p"],
+    "Drag coefficient": profiles["Cd"],
+    **({"Particle temperature (K)": profiles["Tp"]} if particle_heating else {}),
+})
+st.download_button("Download profiles (CSV)", profile_table.to_csv(index=False), file_name="nozzle_profiles.csv", mime="text/csv")
+
+#--------------------------Inverse process design
+st.markdown("\n\n")
+st.divider()
+st.markdown(f"#### Inverse Process Design")
+
+design_mode = st.toggle("Solve for the process parameter that reaches a target exit velocity", value=False)
+if design_mode:
+    design_units = {"P0": ("$P_0$", "bar", 1e-5), "T0": ("$T_0$", "K", 1.0), "Lf": ("$L_f$", "mm", 1e3), "De": ("$D_e$", "mm", 1e3)}
+    design_parameters = [name for name in DESIGN_PARAMETERS
+                         if not (name == "De" and linear_or_custom != "Linear") and not (name == "Lf" and linear_or_custom == "Profile Table")]
+    col_a, col_b = st.columns(2)
+    with col_a:
+        design_name = st.selectbox("Parameter to solve for:", design_parameters, format_func=lambda name: design_units[name][0])
+    with col_b:
+        vp_target = st.number_input("Target exit velocity in m/s:", min_value=50.0, max_value=2000.0, value=float(round(vp_exit, -1) + 50), step=10.0)
+
+    # Warm start from the last two iterates of the previous design for the same parameter
+    warm_starts = st.session_state.setdefault("design_warm_starts", {})
+    x0, x1 = warm_starts.get(design_name, (None, None))
+    design = solve_for_target(
+        config, design_name, vp_target, x0=x0, x1=x1,
+        tol=max(0.5, SOLVER_PROFILES[solver_profile].accuracy),
+        solve=lambda c: cached_solve_particle(c, solver_profile, None if solver_method == "Automatic" else solver_method).vp_exit,
+    )
+    if len(design.history) >= 2:
+        warm_starts[design_name] = (design.history[-1][0], design.history[-2][0])
+
+    label, unit, scale = design_units[design_name]
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.metric(f"Required {label}", f"{design.value*scale:.4g} {unit}")
+    with col_b:
+        st.metric("Exit Velocity Reached", f"{design.vp_exit:.2f} m/s", delta=f"{design.vp_exit - vp_target:+.2f} m/s", delta_color="off")
+    if design.converged:
+        st.caption(f"Found in {design.n_solves} forward solves; all other parameters as in the sidebar.")
+    else:
+        lo, hi = DESIGN_BOUNDS[design_name]
+        st.warning(f"The target is out of reach for {label} between {lo*scale:.4g} and {hi*scale:.4g} {unit}; the closest value is shown ({design.n_solves} forward solves).")
+
+#--------------------------Sensitivity analysis
+st.markdown("\n\n")
+st.divider()
+st.markdown(f"#### Sensitivity of the Exit Velocity")
+
+sensitivity_mode = st.toggle("Rank the sensitivity of the exit velocity to each parameter", value=False)
+if sensitivity_mode:
+    # All derivatives come from one solve of the particle ODE augmented with its sensitivity equations
+    sensitivity = cached_sensitivities(config)
+    sensitivity_text = {"P0": "$P_0$", "T0": "$T_0$", "dp": "$d_p$", "Lf": "$L_f$", "De": "$D_e$", "v0": "$V_0$"}
+    sensitivity_units = {"P0": ("m/s per bar", 1e5), "T0": ("m/s per K", 1.0), "dp": ("m/s per μm", 1e-6),
+                         "Lf": ("m/s per mm", 1e-3), "De": ("m/s per mm", 1e-3), "v0": ("m/s per m/s", 1.0)}
+    ranked = sorted(sensitivity.elasticities, key=lambda name: abs(sensitivity.elasticities[name]))
+
+    fig, ax = plt.subplots()
+    ax.barh([sensitivity_text[name] for name in ranked], [sensitivity.elasticities[name] for name in ranked],
+            color=["b" if sensitivity.elasticities[name] >= 0 else "r" for name in ranked])
+    ax.axvline(0, color="k", linewidth=0.8)
+    ax.set_xlabel("% change in exit velocity per % change in parameter")
+    ax.set_title("Ranked Sensitivity of the Exit Velocity")
+
+    with solver_metrics.timer("matplotlib"):
+        st.pyplot(fig)
+
+    st.dataframe(pd.DataFrame({
+        "Parameter": ranked[::-1],
+        "Derivative": [sensitivity.derivatives[name] * sensitivity_units[name][1] for name in ranked[::-1]],
+        "Unit": [sensitivity_units[name][0] for name in ranked[::-1]],
+        "Relative sensitivity": [sensitivity.elasticities[name] for name in ranked[::-1]],
+    }).round(4), hide_index=True)
+    st.caption(f"From one augmented solve ({sensitivity.nfev} RHS evaluations), instead of two solves per parameter.")
 
 #--------------------------Plot
 st.markdown("\n\n")
@@ -402,37 +500,345 @@ st.divider()
 st.markdown(f"#### Particle Velocity as a Function of Parameter")
 
 variables = {"P0" : P0, "T0" : T0,  "dp" : dp, "Lf" : Lf, "v0" : v0}
+if linear_or_custom == "Profile Table":
+    del variables["Lf"] # The measured profile fixes the length
 variables_text = {"P0" : "$P_0$", "T0" : "$T_0$","dp" :"$d_p$", "Lf" : "$L_f$", "v0" :"$V_0$"}
 var_text = st.selectbox("Select parameter to vary:", variables)
 var_to_vary = variables[var_text]
 var_range = st.slider(f"Select a range of values for {variables_text[var_text]}", var_to_vary/2, 3*var_to_vary/2, (3*var_to_vary/4, 5*var_to_vary/4))
 var_min, var_max = var_range
-plot_range = np.linspace(var_min, var_max, 200)
-
-vp_vals = []
-
-for val in plot_range:
-    variables[var_text] = val
-    P0 = variables["P0"]
-    T0 = variables["T0"]
-    dp = variables["dp"]
-    mp = rho_p * (4/3) * np.pi * (dp/2)**3  # Particle mass (Kg)
-    Ap = np.pi * (dp/2)**2 # Particle projected area
-    Lf = variables["Lf"]
-    v0 = variables["v0"]
-    x_span = (0, Lf) # Integrate from throat to exit
-    sol = solve_ivp(dvp_dx, x_span, [v0], t_eval=np.linspace(0, Lf, 100))
-    vp_vals.append(sol.y[-1, -1])
 
+# The sweep runs in a background job and the chart below is refreshed as points
+# finish. It is sampled adaptively: a coarse grid, then more points only where
+# the curve is not resolved to SWEEP_TOLERANCE. Changing any input cancels the
+# running job; points it already finished are in the result cache.
+sweep_key = (config, var_text, var_min, var_max)
+sweep_job = st.session_state.get("sweep_job")
+if sweep_job is None or st.session_state.get("sweep_key") != sweep_key:
+    if sweep_job is not None:
+        sweep_job.cancel()
+    sweep_exit_velocity = lambda values, config=config, name=var_text: cached_exit_velocity_batch([with_parameter(config, name, val) for val in values])
+    sweep_job = SweepJob(sweep_exit_velocity, var_min, var_max)
+    st.session_state["sweep_job"], st.session_state["sweep_key"] = sweep_job, sweep_key
+
+sweep_polling = not sweep_job.done
+
+@st.fragment(run_every=SWEEP_POLL_INTERVAL if sweep_polling else None)
+def sweep_chart():
+    running = not sweep_job.done
+    plot_range, vp_vals = sweep_job.snapshot()
+
+    fig, ax = plt.subplots()
+    ax.plot(plot_range, vp_vals, "b" if not running else "b.-")
+
+    ax.set_xlabel(variables_text[var_text])
+    ax.set_ylabel("Particle Velocity (m/s)")
+    ax.set_title(f"Particle Velocity vs {variables_text[var_text]}")
+
+    with solver_metrics.timer("matplotlib"):
+        st.pyplot(fig)
+    plt.close(fig)
+
+    if sweep_job.error is not None:
+        st.error(f"The sweep failed: {sweep_job.error}")
+    elif running:
+        st.caption(f"Refining the sweep: {len(vp_vals)} points solved so far…")
+    else:
+        if sweep_polling:
+            st.rerun() # Finished: redraw once more without polling
+        st.caption(f"{len(vp_vals)} solves, placed adaptively for an interpolation error below {SWEEP_TOLERANCE} m/s")
 
-fig, ax = plt.subplots()
-ax.plot(plot_range, vp_vals, "b")
+sweep_chart()
 
-ax.set_xlabel(variables_text[var_text])
-ax.set_ylabel("Particle Velocity (m/s)")
-ax.set_title(f"Particle Velocity vs {variables_text[var_text]}")
+#--------------------------Material x gas comparison
+st.markdown("\n\n")
+st.divider()
+st.markdown(f"#### Material × Gas Comparison")
+
+comparison_mode = st.toggle("Compare powders and carrier gases", value=False)
+if comparison_mode:
+    database_materials = [name for name in MATERIAL_DB if name != "Custom Material"]
+    col1, col2 = st.columns(2)
+    with col1:
+        compared_materials = st.multiselect("Materials:", database_materials, default=database_materials)
+    with col2:
+        compared_gases = st.multiselect("Carrier gases:", list(GAS_DB), default=list(GAS_DB))
+    compare_sweep = st.checkbox(f"Overlay the sweep curves over {variables_text[var_text]}", value=False)
+    if not compared_materials or not compared_gases:
+        st.info("Select at least one material and one carrier gas.")
+    else:
+        # Every combination (and its sweep curve) in one batched, cached solve
+        sweep_values = np.linspace(var_min, var_max, COMPARISON_SWEEP_POINTS) if compare_sweep else ()
+        vp_matrix, vp_curves = comparison_matrix(config, compared_materials, compared_gases, var_text if compare_sweep else None, sweep_values)
+
+        fig, ax = plt.subplots(figsize=(1.3*len(compared_gases) + 2.5, 0.5*len(compared_materials) + 1.5))
+        image = ax.imshow(vp_matrix, cmap="viridis", aspect="auto")
+        ax.set_xticks(range(len(compared_gases)), compared_gases, rotation=30, ha="right")
+        ax.set_yticks(range(len(compared_materials)), compared_materials)
+        for (i, j), vp in np.ndenumerate(vp_matrix):
+            ax.text(j, i, f"{vp:.0f}", ha="center", va="center", color="w" if vp < vp_matrix.mean() else "k", fontsize="small")
+        fig.colorbar(image, ax=ax, label="Exit velocity (m/s)")
+        ax.set_title("Particle Velocity at Exit")
+        fig.tight_layout()
+        with solver_metrics.timer("matplotlib"):
+            st.pyplot(fig)
+
+        st.dataframe(pd.DataFrame(vp_matrix, index=compared_materials, columns=compared_gases).round(1))
+        st.caption(f"{vp_matrix.size * (1 + len(sweep_values))} exit velocities from one batched solve; all other inputs as in the sidebar.")
+
+        if compare_sweep:
+            fig, ax = plt.subplots()
+            linestyles = ["-", "--", ":", "-.", (0, (5, 1))]
+            for i, material in enumerate(compared_materials):
+                for j, gas in enumerate(compared_gases):
+                    ax.plot(sweep_values, vp_curves[i, j], color=f"C{i}", linestyle=linestyles[j % len(linestyles)],
+                            label=f"{material}, {gas}")
+            ax.set_xlabel(variables_text[var_text])
+            ax.set_ylabel("Particle Velocity (m/s)")
+            ax.set_title(f"Particle Velocity vs {variables_text[var_text]}")
+            ax.legend(fontsize="x-small", ncol=2, loc="upper left", bbox_to_anchor=(1.02, 1))
+            with solver_metrics.timer("matplotlib"):
+                st.pyplot(fig)
+
+#--------------------------Spray window
+st.markdown("\n\n")
+st.divider()
+st.markdown(f"#### Spray Window")
+
+window_mode = st.toggle("Map the deposition window over two process parameters", value=False)
+if window_mode and material_name not in cv.MATERIAL_DB:
+    st.info("Critical velocity data is only available for the materials of the Critical Velocity Calculator.")
+elif window_mode:
+    window_variables = [name for name in WINDOW_PARAMETERS if name in variables]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        window_x = st.selectbox("Horizontal axis:", window_variables, format_func=lambda name: variables_text[name], index=window_variables.index("P0"))
+    with col2:
+        window_y = st.selectbox("Vertical axis:", [name for name in window_variables if name != window_x], format_func=lambda name: variables_text[name])
+    with col3:
+        window_model = st.selectbox("Critical velocity model:", CRITICAL_VELOCITY_MODELS, index=1)
+    window_ranges = {}
+    for name in (window_x, window_y):
+        value = variables[name]
+        window_ranges[name] = st.slider(f"Range of {variables_text[name]}", value/2, 3*value/2, (value/2, 3*value/2), key=f"window_range_{name}")
+
+    # Nested grids up to GRID_LEVELS[-1]² points, refined in a background job;
+    # every level is one batched solve of the points not yet in the result cache
+    window_key = (config, window_x, window_y, window_ranges[window_x], window_ranges[window_y])
+    window_job = st.session_state.get("window_job")
+    if window_job is None or st.session_state.get("window_key") != window_key:
+        if window_job is not None:
+            window_job.cancel()
+        window_state = lambda X, Y, config=config, x_name=window_x, y_name=window_y: exit_state_grid(config, x_name, X, y_name, Y)
+        window_job = GridJob(window_state, *window_ranges[window_x], *window_ranges[window_y])
+        st.session_state["window_job"], st.session_state["window_key"] = window_job, window_key
+
+    window_polling = not window_job.done
+
+    @st.fragment(run_every=SWEEP_POLL_INTERVAL if window_polling else None)
+    def window_chart():
+        running = not window_job.done
+        snapshot = window_job.snapshot()
+        if window_job.error is not None:
+            st.error(f"The spray window failed: {window_job.error}")
+            return
+        if snapshot is None:
+            st.caption("Solving the first grid level…")
+            return
+        x, y, state = snapshot
+        X, Y = np.meshgrid(x, y, indexing="ij")
+        eta = velocity_ratio(config, material_name, window_x, X, window_y, Y, state)[window_model]
+
+        fig, ax = plt.subplots()
+        mesh = ax.pcolormesh(X, Y, eta, cmap="RdYlGn", norm=mcolors.TwoSlopeNorm(1.0, vmin=min(eta.min(), 0.99), vmax=max(eta.max(), 1.01)), shading="gouraud")
+        fig.colorbar(mesh, ax=ax, label="$\\eta = v_p / v_{cr}$")
+        if eta.min() < 1 < eta.max():
+            ax.contour(X, Y, eta, levels=[1.0], colors="k", linewidths=1.5)
+        ax.contourf(X, Y, eta, levels=[1.0, np.inf], colors="none", hatches=["//"])
+        ax.plot(variables[window_x], variables[window_y], "k*", markersize=12, label="Current inputs")
+        ax.set_xlabel(variables_text[window_x])
+        ax.set_ylabel(variables_text[window_y])
+        ax.legend(loc="upper left", fontsize="small")
+        ax.set_title(f"Deposition Window ({window_model})")
+        with solver_metrics.timer("matplotlib"):
+            st.pyplot(fig)
+        plt.close(fig)
+
+        if running:
+            st.caption(f"Refining the map: {len(x)}×{len(y)} grid solved so far…")
+        else:
+            if window_polling:
+                st.rerun() # Finished: redraw once more without polling
+            st.caption(f"{len(x)}×{len(y)} grid; hatched where $v_p \\geq v_{{cr}}$ ({100*np.mean(eta >= 1):.0f} % of the map). "
+                       + ("Impact temperatures from the coupled solve." if particle_heating else "Impact temperature at the material default; switch on particle heating to compute it."))
+
+    window_chart()
+
+#--------------------------Database papers
+st.markdown("\n\n")
+st.divider()
+st.markdown(f"#### Database Papers")
+
+papers_mode = st.toggle("Predict the particle velocity of every paper in the database", value=False)
+if papers_mode:
+    # All papers' runs in one batched, cached solve
+    paper_table = predict_papers(config)
+    solved = paper_table["Predicted vp (m/s)"].notna()
+    vcr_columns = [f"vcr {model} (m/s)" for model in CRITICAL_VELOCITY_MODELS]
+
+    fig, ax = plt.subplots(figsize=(8, 0.35*len(paper_table) + 1.5))
+    labels = [f"{doi} ({gas})" for doi, gas in zip(paper_table["DOI"], paper_table["Gas"])]
+    rows = np.arange(len(paper_table))
+    ax.barh(rows, paper_table["Predicted vp (m/s)"], color="C0", alpha=0.7, label="Predicted exit velocity")
+    for k, column in enumerate(vcr_columns):
+        ax.scatter(paper_table[column], rows, marker="|", s=200, color=f"C{k + 1}", label=column.removeprefix("vcr ").removesuffix(" (m/s)"))
+    ax.set_yticks(rows, labels, fontsize="x-small")
+    ax.invert_yaxis()
+    ax.set_xlabel("Velocity (m/s)")
+    ax.set_title("Predicted Particle Velocity vs Critical Velocity")
+    ax.legend(fontsize="x-small", loc="upper left", bbox_to_anchor=(1.02, 1))
+    with solver_metrics.timer("matplotlib"):
+        st.pyplot(fig)
+    plt.close(fig)
+
+    st.dataframe(paper_table.round(1), hide_index=True)
+    st.caption(f"{solved.sum()} of {len(paper_table)} process runs solved in one batch with each paper's carrier gas, pressure, temperature, powder and particle size; "
+               "the nozzle, injection velocity and drag correlation are the sidebar's, as the database records no nozzle geometry. "
+               "Alloys take the density of their base element, powders without a recorded size are assumed 20 μm, and runs with an unknown gas or a pressure without a unit are not solved. "
+               "Reported velocities are those of the paper's computational studies.")
+
+    reported_vcr = reported_critical_velocities()
+    if len(reported_vcr):
+        st.markdown("Critical velocities reported in the database against the models:")
+        st.dataframe(reported_vcr.round(1), hide_index=True)
+
+#--------------------------Particle size distribution
+st.markdown("\n\n")
+st.divider()
+st.markdown(f"#### Particle Size Distribution")
+
+psd_mode = st.toggle("Use a particle size distribution instead of a single diameter", value=False)
+if psd_mode:
+    psd_kind = st.selectbox("Distribution:", PSD_KINDS)
+    if psd_kind != "Measured histogram":
+        col_a, col_b, col_c = st.columns(3)
+        with col_a:
+            psd_mean = st.number_input("Mean diameter in μm:", min_value=1.0, max_value=100.0, value=dp*1e6)
+        with col_b:
+            psd_std = st.number_input("Standard deviation in μm:", min_value=0.1, max_value=50.0, value=0.4*dp*1e6)
+        with col_c:
+            n_classes = st.slider("Size classes:", min_value=50, max_value=500, value=200)
+        d_classes, psd_weights = distribution_classes(psd_kind, psd_mean, psd_std, n_classes)
+    else:
+        histogram = st.data_editor(
+            pd.DataFrame({"Size (μm)": [5.0, 10.0, 15.0, 20.0, 25.0, 30.0, 40.0], "Fraction": [0.02, 0.10, 0.22, 0.28, 0.20, 0.12, 0.06]}),
+            num_rows="dynamic",
+        )
+        try:
+            d_classes, psd_weights = histogram_classes(histogram["Size (μm)"].fillna(0), histogram["Fraction"].fillna(0))
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+    psd_basis = st.radio("Distribution basis:", ["Volume (mass)", "Number"], horizontal=True, help="Laser diffraction usually reports volume-based distributions.")
+    mass_weights = to_mass_weights(d_classes, psd_weights, "number" if psd_basis == "Number" else "mass")
 
-st.pyplot(fig)
+    # All size classes in one batched (and cached) solve, with their impact temperatures when heating is on
+    class_configs = [with_parameter(config, "dp", d*1e-6) for d in d_classes]
+    if particle_heating:
+        vp_classes, Tp_classes = cached_exit_state_batch(class_configs)
+    else:
+        vp_classes, Tp_classes = cached_exit_velocity_batch(class_configs), None
+    st.metric("Mass-weighted Mean Exit Velocity", f"{np.sum(mass_weights * vp_classes):.2f} m/s")
+
+    fig, ax = plt.subplots()
+    ax.plot(d_classes, vp_classes, "b", label="Exit velocity")
+    if material_name in cv.MATERIAL_DB:
+        vcr_classes = cv.critical_velocities(material_name, d_classes, Tp=None if Tp_classes is None else Tp_classes - 273.15)
+        for (model, vcr), color, col in zip(vcr_classes.items(), ["r", "g", "k"], st.columns(len(vcr_classes))):
+            ax.plot(d_classes, vcr, color + "--", label=f"$v_{{cr}}$ {model}")
+            with col:
+                st.metric(f"Depositing Mass Fraction, {model}", f"{100*depositing_fraction(vp_classes, vcr, mass_weights):.1f} %")
+    else:
+        st.info("Critical velocity data is only available for the materials of the Critical Velocity Calculator.")
+    ax.set_xlabel("$d_p$ (μm)")
+    ax.set_ylabel("Velocity (m/s)")
+    ax.legend(loc="upper right", fontsize="small")
+    ax_psd = ax.twinx()
+    ax_psd.fill_between(d_classes, mass_weights / np.gradient(d_classes) if len(d_classes) > 1 else mass_weights, color="0.8", alpha=0.5)
+    ax_psd.set_ylabel("Mass fraction per μm")
+    ax_psd.set_ylim(bottom=0)
+    ax.set_zorder(ax_psd.get_zorder() + 1)
+    ax.patch.set_visible(False)
+    ax.set_title("Exit Velocity over the Particle Size Distribution")
+    with solver_metrics.timer("matplotlib"):
+        st.pyplot(fig)
+
+#--------------------------Uncertainty propagation
+st.markdown("\n\n")
+st.divider()
+st.markdown(f"#### Uncertainty of the Exit Velocity")
+
+uncertainty_mode = st.toggle("Propagate measurement scatter of the inputs", value=False)
+if uncertainty_mode:
+    # Label, page unit, page unit -> SI factor and default spread in page units
+    uncertain_inputs = {"P0": ("$P_0$", "bar", 1e5, 1.0), "T0": ("$T_0$", "K", 1.0, 10.0),
+                        "dp": ("$d_p$", "μm", 1e-6, 0.2*dp*1e6), "rho_p": ("$ρ_p$", "Kg/m³", 1.0, 50.0)}
+    spreads = {}
+    for name in UNCERTAIN_PARAMETERS:
+        label, unit, scale, spread_default = uncertain_inputs[name]
+        col_a, col_b = st.columns(2)
+        with col_a:
+            distribution = st.selectbox(f"Distribution of {label}:", INPUT_DISTRIBUTIONS, key=f"mc_distribution_{name}")
+        with col_b:
+            spread = st.number_input(
+                f"{'Standard deviation' if distribution == 'Normal' else 'Half-width'} of {label} in {unit}:",
+                min_value=0.0, value=float(spread_default), key=f"mc_spread_{name}"
+            )
+        if spread > 0:
+            spreads[name] = (distribution, spread * scale)
+
+    col_a, col_b = st.columns(2)
+    with col_a:
+        sampling_method = st.radio("Sampling:", SAMPLING_METHODS, horizontal=True)
+    with col_b:
+        n_samples = st.select_slider("Samples:", options=[512, 1024, 2048, 4096], value=2048)
+
+    if not spreads:
+        st.info("Give at least one input a non-zero spread.")
+    else:
+        # One batched, cached solve of the whole sample
+        samples, vp_samples = monte_carlo_exit_velocity(config, spreads, n_samples, sampling_method)
+        summary = summarize(vp_samples)
+        col_a, col_b, col_c = st.columns(3)
+        with col_a:
+            st.metric("Mean Exit Velocity", f"{summary['mean']:.1f} m/s")
+        with col_b:
+            st.metric("Standard Deviation", f"{summary['std']:.1f} m/s")
+        with col_c:
+            st.metric(f"{MC_PERCENTILES[0]}–{MC_PERCENTILES[-1]} % Range", f"{summary[f'p{MC_PERCENTILES[0]}']:.0f}–{summary[f'p{MC_PERCENTILES[-1]}']:.0f} m/s")
+
+        fig, ax = plt.subplots()
+        ax.hist(vp_samples, bins=50, color="b", alpha=0.6)
+        for q, style in zip(MC_PERCENTILES, ["k--", "k-", "k--"]):
+            ax.axvline(summary[f"p{q}"], color=style[0], linestyle=style[1:], linewidth=1, label=f"P{q} = {summary[f'p{q}']:.0f} m/s")
+        ax.set_xlabel("Particle Velocity at Exit (m/s)")
+        ax.set_ylabel("Samples")
+        ax.legend(fontsize="small")
+        ax.set_title(f"Exit Velocity over {len(vp_samples)} {sampling_method} Samples")
+        with solver_metrics.timer("matplotlib"):
+            st.pyplot(fig)
+
+#--------------------------Solver diagnostics
+if metrics is not None:
+    cache_stats = get_cache().stats()
+    metrics.log(page="ParticleVelocity", gas=gas_name, material=material_name, profile=solver_profile, cache=cache_stats)
+    with st.expander("Solver diagnostics", expanded=True):
+        st.dataframe(pd.DataFrame(metrics.rows()).round(3), hide_index=True)
+        lookups = cache_stats.get("hits", 0) + cache_stats.get("misses", 0)
+        st.caption(f"Result cache (all sessions): {cache_stats['entries']} entries, {cache_stats.get('hits', 0)} hits and {cache_stats.get('misses', 0)} misses"
+                   + (f" ({100*cache_stats.get('hits', 0)/lookups:.0f}% hit rate)." if lookups else "."))
+        st.caption(f"Rerun time: {1e3*metrics.elapsed():.0f} ms. Times include nested calls, so solve times contain their RHS and drag evaluations. "
+                   "Iterations count Newton steps of the area-Mach inversion. Cached results skip the solver, and work in worker processes is not counted.")
 
 #--------------------------
 #--------------------------
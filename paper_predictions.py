@@ -0,0 +1,299 @@
+"""
+Particle and critical velocity predictions for the papers of the RDF database.
+
+One SPARQL query extracts the spray process (carrier gas, gas pressure, nozzle
+temperature) and the powder (composition, particle size) of every
+cs:ColdSprayPaper. Units are normalized, each powder is matched to a
+MATERIAL_DB entry by its base element, and all runs are solved in one cached
+(and, with COLDSPRAY_WORKERS set, parallel) batch. A second query collects the impact
+velocities the papers report, so the predictions can be compared with them.
+
+The database records no nozzle geometry, so all runs use the nozzle of the
+config they are predicted with. Run as a script for a CSV of all predictions:
+
+    python paper_predictions.py [database.ttl] [--output predictions.csv]
+"""
+import os
+import re
+import sys
+import argparse
+import functools
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+from rdflib import Graph
+
+import critical_velocity as cv
+from particle_solver import MATERIAL_DB, GAS_DB
+from size_distribution import parse_size_value
+from solver_cache import cached_exit_velocity_batch, cached_exit_state_batch
+
+DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database4_example.ttl")
+DEFAULT_SIZE = 20.0 # Particle diameter (μm) of powders without a recorded size
+
+PROCESS_QUERY = """
+PREFIX cs: <http://example.org/coldspray#>
+SELECT ?paper ?doi ?gas ?pressure ?pressureUnit ?temperature ?temperatureUnit ?composition ?condition ?sizeName ?size ?sizeUnit WHERE {
+    ?paper a cs:ColdSprayPaper ;
+        cs:hasColdSprayProcess ?process .
+    OPTIONAL { ?paper cs:hasDOI ?doi }
+    ?process cs:carrierGas ?gas .
+    OPTIONAL { ?process cs:gasPressure ?pressure }
+    OPTIONAL { ?process cs:gasPressureUnit ?pressureUnit }
+    OPTIONAL { ?process cs:nozzleTemperature ?temperature }
+    OPTIONAL { ?process cs:nozzleTemperatureUnit ?temperatureUnit }
+    OPTIONAL {
+        ?paper cs:hasMaterial ?material .
+        ?material cs:hasComposition ?composition .
+        OPTIONAL { ?material cs:hasCondition ?condition }
+        OPTIONAL {
+            ?material cs:hasPhysicalProperty ?property .
+            ?property cs:propertyName ?sizeName ;
+                cs:propertyValue ?size .
+            OPTIONAL { ?property cs:propertyUnit ?sizeUnit }
+            FILTER (regex(?sizeName, "size|radius", "i") && !regex(?sizeName, "grain|shape", "i"))
+        }
+    }
+}
+"""
+
+REPORTED_QUERY = """
+PREFIX cs: <http://example.org/coldspray#>
+SELECT DISTINCT ?paper ?metricName ?metricValue ?metricUnit ?impactVelocity ?impactTemperature WHERE {
+    ?paper a cs:ColdSprayPaper ;
+        cs:hasComputationalStudy ?study .
+    ?study ?hasOutcome ?outcome .
+    ?outcome cs:predictedMetric ?metric .
+    ?metric cs:metricName ?metricName .
+    OPTIONAL { ?metric cs:metricValue ?metricValue }
+    OPTIONAL { ?metric cs:metricUnit ?metricUnit }
+    OPTIONAL { ?metric cs:atImpactVelocity ?impactVelocity }
+    OPTIONAL { ?metric cs:atImpactTemperature ?impactTemperature }
+}
+"""
+
+PRESSURE_UNITS = {"pa": 1.0, "kpa": 1e3, "mpa": 1e6, "bar": 1e5, "psi": 6894.757, "atm": 101325.0}
+# Particle size units to μm; "lm" is a common OCR misreading of μm
+SIZE_UNITS = {"μm": 1.0, "µm": 1.0, "um": 1.0, "lm": 1.0, "nm": 1e-3, "mm": 1e3}
+VELOCITY_UNITS = {"m/s": 1.0, "ms⁻¹": 1.0, "ms-1": 1.0, "km/s": 1e3, "km/sec": 1e3}
+
+# Carrier gas names as written in papers -> GAS_DB entry
+GAS_NAMES = {
+    "nitrogen": "Nitrogen (N2)", "n2": "Nitrogen (N2)",
+    "helium": "Helium (He)", "he": "Helium (He)",
+    "argon": "Argon (Ar)", "ar": "Argon (Ar)",
+    "hydrogen": "Hydrogen (H2)", "h2": "Hydrogen (H2)",
+    "air": "Air", "compressed air": "Air",
+}
+
+# Base element patterns -> MATERIAL_DB entry. Alloys take the density of their
+# base element, the one named first (e.g. Ti6Al4V is titanium, Cu10Al5Fe5Ni copper).
+MATERIAL_PATTERNS = {
+    "Aluminum (Al)": r"\bAA\d|Al(?![a-z2])|[Aa]lumin(?:um|ium)(?! ?oxide)",
+    "Copper (Cu)": r"Cu(?![a-z])|[Cc]opper",
+    "Titanium (Ti)": r"Ti(?![a-z])|[Tt]itanium",
+    "Nickel (Ni)": r"Ni(?![a-z])|[Nn]ickel",
+    "Magnesium (Mg)": r"Mg(?![a-z])|\bAZ\d|[Mm]agnesium",
+    "Iron (Fe)": r"Fe(?![a-z])|[Ii]ron|[Ss]teel",
+}
+
+def normalize_doi(text):
+    """Bare DOI of a database value or paper IRI (e.g. "http://dx.doi.org/10.1016/...")."""
+    return re.sub(r"^https?://(dx\.)?doi\.org/", "", str(text).strip())
+
+def parse_number(text):
+    """First number in a database value like "2.8", "1.4 MPa", "~1000" or "9.808e2"; NaN if none."""
+    match = re.search(r"[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?", str(text or ""))
+    return float(match.group()) if match else np.nan
+
+def split_values(text):
+    """Comma-separated entries of a value (e.g. "Nitrogen, Helium"), or [""] if missing."""
+    return [part.strip() for part in str(text or "").split(",")]
+
+def to_pascal(value, unit):
+    """Pressure (Pa) of a value in a PRESSURE_UNITS unit; NaN if the unit is missing or unknown."""
+    return parse_number(value) * PRESSURE_UNITS.get(str(unit or "").strip().lower(), np.nan)
+
+def to_kelvin(value, unit):
+    unit = str(unit or "°C").strip()
+    return parse_number(value) + (0.0 if unit == "K" else 273.15)
+
+def to_metres_per_second(text):
+    """Velocity (m/s) from values like "530 m/s (average)", "700 m s⁻¹" or "3.0 km/sec"; NaN without a velocity unit."""
+    text = str(text or "")
+    compact = text.replace(" ", "").lower()
+    for unit, scale in sorted(VELOCITY_UNITS.items(), key=lambda item: -len(item[0])):
+        if unit in compact:
+            return parse_number(text) * scale
+    return np.nan
+
+def carrier_gas(name):
+    return GAS_NAMES.get(str(name).strip().lower())
+
+def powder_composition(composition):
+    """The powder part of a composition that also lists the substrate, e.g. "AZ31B-H24 (substrate), AA7075 (coating)"."""
+    parts = [part for part in composition.split(",") if not re.search(r"substrate|plate|sheet", part, re.I)]
+    return (parts or [composition])[0].strip()
+
+def material_for(composition):
+    """MATERIAL_DB entry of a powder composition, by the base element named first; None if unknown."""
+    positions = {}
+    for name, pattern in MATERIAL_PATTERNS.items():
+        match = re.search(pattern, composition)
+        if match:
+            positions[name] = match.start()
+    return min(positions, key=positions.get) if positions else None
+
+def size_rank(name):
+    # Prefer the median (D50) or a mean size over the D10/D90 tails
+    name = name.lower()
+    return 0 if "d50" in name or "mean" in name or "average" in name or name == "size" else 2 if re.search(r"d10|d90", name) else 1
+
+@functools.lru_cache(maxsize=4)
+def load_graph(path=DATABASE_PATH):
+    graph = Graph()
+    graph.parse(path, format="ttl")
+    return graph
+
+def process_runs(graph):
+    """
+    One row per paper, carrier gas and powder: doi, gas (GAS_DB entry), P0 (Pa),
+    T0 (K), composition, material (MATERIAL_DB entry), dp (μm), size_recorded.
+    Processes listing several gases (e.g. "Nitrogen, Helium" at "6.5, 4.0" MPa)
+    give one run per gas. Runs whose gas or powder cannot be matched get None.
+    """
+    records = [{str(var): (None if value is None else str(value)) for var, value in zip(row.labels, row)} for row in graph.query(PROCESS_QUERY)]
+    runs = {}
+    for r in records:
+        # Powders only: skip materials recorded as substrates
+        condition = r["condition"] or ""
+        if r["composition"] and re.search(r"substrate|plate", condition, re.I) and not re.search(r"powder", condition, re.I):
+            continue
+        gases, pressures, temperatures = split_values(r["gas"]), split_values(r["pressure"]), split_values(r["temperature"])
+        for i, gas in enumerate(gases):
+            composition = powder_composition(r["composition"] or "")
+            key = (r["paper"], gas, pressures[min(i, len(pressures) - 1)], temperatures[min(i, len(temperatures) - 1)], composition)
+            run = runs.setdefault(key, {
+                "doi": normalize_doi(r["doi"] or r["paper"]), "gas_recorded": gas, "gas": carrier_gas(gas),
+                "P0": to_pascal(key[2], r["pressureUnit"]), "T0": to_kelvin(key[3], r["temperatureUnit"]),
+                "composition": composition, "material": material_for(composition),
+                "dp": DEFAULT_SIZE, "size_recorded": False, "size_rank": 3,
+            })
+            if r["size"] and size_rank(r["sizeName"]) < run["size_rank"]:
+                try:
+                    mean, _ = parse_size_value(r["size"])
+                except ValueError:
+                    continue
+                scale = SIZE_UNITS.get(str(r["sizeUnit"] or "").strip())
+                if scale is None:
+                    continue
+                # Radii are doubled
+                run.update(dp=mean * scale * (2 if "radius" in r["sizeName"].lower() else 1), size_recorded=True, size_rank=size_rank(r["sizeName"]))
+    table = pd.DataFrame(list(runs.values()), columns=["doi", "gas_recorded", "gas", "P0", "T0", "composition", "material", "dp", "size_recorded", "size_rank"])
+    return table.drop(columns="size_rank")
+
+def reported_velocities(graph):
+    """Per paper: the particle or impact velocities (m/s) its computational studies report, as a comma-separated string."""
+    rows = {}
+    for r in graph.query(REPORTED_QUERY):
+        doi = normalize_doi(r.paper)
+        values = [to_metres_per_second(r.impactVelocity)]
+        if re.search(r"particle velocity", str(r.metricName), re.I):
+            values.append(to_metres_per_second(f"{r.metricValue} {r.metricUnit}"))
+        rows.setdefault(doi, set()).update(v for v in values if not np.isnan(v))
+    return {doi: ", ".join(f"{v:.0f}" for v in sorted(values)) for doi, values in rows.items() if values}
+
+def reported_critical_velocities(graph=None):
+    """
+    Critical velocities the papers report for a named powder (e.g. "Critical
+    Velocity ... for 20 μm Cu particle") against the critical velocity models at
+    that size and the reported impact temperature, as a DataFrame.
+    """
+    graph = graph or load_graph()
+    rows = []
+    for r in graph.query(REPORTED_QUERY):
+        name = str(r.metricName)
+        match = re.search(r"(\d+(?:\.\d+)?)\s*[μµ]m\s+(\S+)", name)
+        material = material_for(match.group(2)) if match and re.search(r"critical velocity", name, re.I) else None
+        if material not in cv.MATERIAL_DB:
+            continue
+        dp = float(match.group(1))
+        temperature = str(r.impactTemperature or "")
+        Tp = to_kelvin(temperature, "K" if re.search(r"\d\s*K\b", temperature) else "°C") - 273.15
+        row = {"DOI": normalize_doi(r.paper), "Powder": match.group(2), "Material": material, "dp (μm)": dp,
+               "Tp (°C)": Tp, "Reported vcr (m/s)": to_metres_per_second(f"{r.metricValue} {r.metricUnit}")}
+        vcr = cv.critical_velocities(material, dp, Tp=None if np.isnan(Tp) else Tp)
+        row.update({f"vcr {model} (m/s)": float(value) for model, value in vcr.items()})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def predict_papers(config, graph=None):
+    """
+    Predicted exit velocity, impact temperature (with particle heating) and
+    critical velocities for every process run of the database, as a DataFrame.
+    Each run takes its gas, P0, T0, powder density and size from the database
+    and everything else (nozzle, v0, drag, heating) from config. All runs are
+    one cached batch, split across the process pool when it is enabled.
+    """
+    graph = graph or load_graph()
+    runs = process_runs(graph)
+    solvable = runs["gas"].notna() & runs["material"].notna() & runs["P0"].notna() & runs["T0"].notna()
+    configs = []
+    for run in runs[solvable].itertuples():
+        gas, material = GAS_DB[run.gas], MATERIAL_DB[run.material]
+        particle = replace(config.particle, rho_p=material["rho_p"], dp=run.dp * 1e-6, cp=material["cp"] if config.particle.thermal else None)
+        configs.append(replace(config, gas=replace(config.gas, gamma=gas["Gamma"], R=gas["R"], P0=run.P0, T0=run.T0), particle=particle))
+
+    vp = np.full(len(runs), np.nan)
+    Tp = np.full(len(runs), np.nan)
+    if configs:
+        if config.particle.thermal:
+            vp[solvable], Tp[solvable] = cached_exit_state_batch(configs)
+        else:
+            vp[solvable] = cached_exit_velocity_batch(configs)
+
+    table = pd.DataFrame({
+        "DOI": runs["doi"], "Powder": runs["composition"], "Material": runs["material"],
+        "Gas": runs["gas_recorded"], "P0 (bar)": runs["P0"] / 1e5, "T0 (K)": runs["T0"],
+        "dp (μm)": runs["dp"], "Size recorded": runs["size_recorded"],
+        "Predicted vp (m/s)": vp,
+    })
+    if config.particle.thermal:
+        table["Predicted Tp (K)"] = Tp
+    for model in cv.CRITICAL_VELOCITY_MODELS:
+        table[f"vcr {model} (m/s)"] = np.nan
+    for i, run in runs.iterrows():
+        if run["material"] in cv.MATERIAL_DB:
+            vcr = cv.critical_velocities(run["material"], run["dp"], Tp=None if np.isnan(Tp[i]) else Tp[i] - 273.15)
+            for model, value in vcr.items():
+                table.loc[i, f"vcr {model} (m/s)"] = float(value)
+    reported = reported_velocities(graph)
+    table["Reported velocity (m/s)"] = table["DOI"].map(reported)
+    return table
+
+def main(argv=None):
+    from particle_solver import GasConfig, ParticleConfig, NozzleConfig, SprayConfig
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("database", nargs="?", default=DATABASE_PATH, help="RDF (Turtle) database")
+    parser.add_argument("--output", help="Write the predictions to this CSV file")
+    args = parser.parse_args(argv)
+
+    # The particle velocity page's default nozzle and injection velocity
+    config = SprayConfig(
+        gas=GasConfig(gamma=1.4, R=296.8, P0=30e5, T0=973.0),
+        particle=ParticleConfig(rho_p=8960.0, dp=20e-6, v0=20.0),
+        nozzle=NozzleConfig(Dnt=1.5e-3, De=5e-3, Lf=100e-3),
+    )
+    table = predict_papers(config, load_graph(args.database))
+    with pd.option_context("display.width", 250, "display.max_columns", None, "display.max_colwidth", 40):
+        print(table.round(1).to_string(index=False))
+        print()
+        print(reported_critical_velocities(load_graph(args.database)).round(1).to_string(index=False))
+    if args.output:
+        table.to_csv(args.output, index=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Inverse process design: find the value of one process parameter (P0, T0, Lf or
+De) for which the exit particle velocity reaches a target.
+
+The forward solver is called through a user-supplied solve(config) function, so
+the page can route it through the result cache. Changing P0 or T0 keeps the
+nozzle geometry, so every iterate reuses the cached Mach profile and only
+rescales the gas state; changing Lf or De builds one new gas field per iterate.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from particle_solver import with_parameter, get_parameter, solve_particle
+
+DESIGN_PARAMETERS = ("P0", "T0", "Lf", "De")
+# Search bounds in SI units, the same ranges as the sidebar sliders
+DESIGN_BOUNDS = {"P0": (5e5, 60e5), "T0": (573.0, 1373.0), "Lf": (40e-3, 300e-3), "De": (4e-3, 20e-3)}
+DESIGN_FIRST_STEP = 0.05 # First secant step, as a fraction of the search interval
+
+@dataclass(frozen=True)
+class DesignResult:
+    name: str # Parameter that was solved for
+    value: float # Parameter value (SI) of the best iterate
+    vp_exit: float # Exit particle velocity at value (m/s)
+    target: float # Target exit velocity (m/s)
+    n_solves: int # Forward solves used
+    converged: bool # |vp_exit - target| <= tol
+    history: tuple = () # ((value, vp_exit), ...) of every forward solve, in order
+
+def _standard_exit_velocity(config):
+    return solve_particle(config, "standard").vp_exit
+
+def solve_for_target(config, name, target, bounds=None, x0=None, x1=None, tol=0.5, max_solves=12, solve=None):
+    """
+    Value of the parameter name for which solve(config) equals target, within bounds.
+
+    A secant iteration starts from the warm start x0 (default: the value in config)
+    and x1 (default: a small step towards the target, assuming the velocity rises
+    with the parameter). Passing the last two iterates of a previous design as
+    x0 and x1 usually converges in one or two solves. Once the target is bracketed,
+    steps that leave the bracket are replaced by bisection. If the target is out of
+    reach within bounds, the closest bound is returned with converged=False.
+    """
+    lo, hi = bounds or DESIGN_BOUNDS[name]
+    solve = solve or _standard_exit_velocity
+    history = []
+
+    def residual(value):
+        vp = float(solve(with_parameter(config, name, value)))
+        history.append((value, vp))
+        return vp - target
+
+    def history_vp(value):
+        return next(vp for v, vp in reversed(history) if v == value)
+
+    def result(converged):
+        value, vp = min(history, key=lambda h: abs(h[1] - target))
+        return DesignResult(name, value, vp, target, len(history), converged, tuple(history))
+
+    xa = float(np.clip(get_parameter(config, name) if x0 is None else x0, lo, hi))
+    fa = residual(xa)
+    if abs(fa) <= tol:
+        return result(True)
+    if x1 is None:
+        x1 = xa - np.sign(fa) * DESIGN_FIRST_STEP * (hi - lo)
+    xb = float(np.clip(x1, lo, hi))
+    if xb == xa:
+        xb = float(np.clip(xa + np.sign(fa) * DESIGN_FIRST_STEP * (hi - lo), lo, hi))
+    fb = residual(xb)
+    bracket = (min(xa, xb), max(xa, xb)) if fa * fb < 0 else None
+
+    while abs(fb) > tol and len(history) < max_solves:
+        slope = (fb - fa) / (xb - xa) if xb != xa else 0.0
+        x_new = xb - fb / slope if slope != 0 else np.nan
+        if bracket is not None:
+            if not bracket[0] < x_new < bracket[1]:
+                x_new = 0.5 * (bracket[0] + bracket[1])
+        else:
+            if not np.isfinite(x_new):
+                break
+            x_new = float(np.clip(x_new, lo, hi))
+            if x_new == xb:
+                break # Pinned at a bound: the target is out of reach
+        f_new = residual(x_new)
+        if bracket is not None:
+            # Keep the half of the bracket that still contains the sign change
+            bracket = (bracket[0], x_new) if (history_vp(bracket[0]) - target) * f_new < 0 else (x_new, bracket[1])
+        elif fb * f_new < 0:
+            bracket = (min(xb, x_new), max(xb, x_new))
+        xa, fa, xb, fb = xb, fb, x_new, f_new
+
+    return result(abs(fb) <= tol)
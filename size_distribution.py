@@ -0,0 +1,63 @@
+"""
+Particle size distributions (PSD) for the particle velocity calculator.
+
+A distribution is discretized into size classes (diameters in μm with weights
+that sum to one). The exit velocity of all classes comes from one batched solve,
+and comparing it with a critical velocity gives the depositing fraction.
+"""
+import re
+
+import numpy as np
+from scipy import stats
+
+PSD_KINDS = ("Normal", "Lognormal", "Measured histogram")
+PSD_SIZE_RANGE = (0.5, 150.0) # Diameters (μm) the classes are clipped to
+
+def parse_size_value(text):
+    """Mean and standard deviation (μm) from database values like "18.6 ± 8.2", "25" or "15-45"."""
+    numbers = [float(v) for v in re.findall(r"\d+(?:\.\d+)?", text)]
+    if "±" in text and len(numbers) >= 2:
+        return numbers[0], numbers[1]
+    if re.search(r"\d\s*[-–]\s*\d", text) and len(numbers) >= 2:
+        # Range: centre and a standard deviation covering it at ±2σ
+        return (numbers[0] + numbers[1]) / 2, (numbers[1] - numbers[0]) / 4
+    if numbers:
+        return numbers[0], 0.0
+    raise ValueError(f"No particle size in {text!r}")
+
+def distribution_classes(kind, mean, std, n_classes=200):
+    """
+    Equal-width size classes between the 0.01% and 99.99% quantiles (clipped to
+    PSD_SIZE_RANGE) of a normal or lognormal distribution with the given arithmetic mean and standard deviation (μm).
+    Returns class centres d (μm) and the probability of each class.
+    """
+    if kind == "Normal":
+        dist = stats.norm(loc=mean, scale=std)
+    elif kind == "Lognormal":
+        sigma = np.sqrt(np.log(1 + (std / mean)**2))
+        dist = stats.lognorm(s=sigma, scale=mean / np.sqrt(1 + (std / mean)**2))
+    else:
+        raise ValueError(f"Unknown distribution {kind!r}")
+    lo = max(dist.ppf(1e-4), PSD_SIZE_RANGE[0])
+    hi = min(dist.ppf(1 - 1e-4), PSD_SIZE_RANGE[1])
+    edges = np.linspace(lo, hi, n_classes + 1)
+    weights = np.diff(dist.cdf(edges))
+    return (edges[:-1] + edges[1:]) / 2, weights / weights.sum()
+
+def histogram_classes(sizes, fractions):
+    """Size classes from a measured histogram of class centres (μm) and fractions (any scale)."""
+    sizes, fractions = np.asarray(sizes, dtype=float), np.asarray(fractions, dtype=float)
+    keep = (sizes > 0) & (fractions > 0)
+    if not keep.any():
+        raise ValueError("The histogram needs at least one class with a positive size and fraction.")
+    order = np.argsort(sizes[keep])
+    return sizes[keep][order], fractions[keep][order] / fractions[keep].sum()
+
+def to_mass_weights(d, weights, basis="number"):
+    """Mass (volume) fractions of the classes; number-based weights are scaled by d³."""
+    mass = weights * d**3 if basis == "number" else np.asarray(weights, dtype=float)
+    return mass / mass.sum()
+
+def depositing_fraction(vp, vcr, weights):
+    """Weighted fraction of the classes whose exit velocity reaches the critical velocity."""
+    return float(np.sum(weights[vp >= vcr]) / np.sum(weights))
@@ -0,0 +1,166 @@
+"""
+Persistent on-disk cache of particle-velocity solver results.
+
+Results are stored in a SQLite file, so they survive restarts and are shared by
+every server worker process. Keys are canonical hashes of the full solver input
+(gas, particle, nozzle and tolerances). The number of rows is capped and the
+least recently used rows are evicted first. Hit/miss counters live in the same
+file, so they cover all processes.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import functools
+from dataclasses import asdict
+
+import numpy as np
+
+from particle_solver import SolveReport, SensitivityReport, solve_particle, solve_nozzle_profiles, solve_sensitivities
+from solver_pool import solve_exit_velocity_parallel, solve_exit_state_parallel
+from solver_metrics import instrumented
+
+# Bump when the physics changes, so stale results are never served
+CACHE_VERSION = 5
+DEFAULT_CACHE_PATH = os.environ.get("COLDSPRAY_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".solver_cache.sqlite"))
+DEFAULT_MAX_ENTRIES = 200_000
+
+def _canonical(value):
+    # Floats are written with repr, and ints as floats, so 973 and 973.0 hash the same
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    return repr(float(value))
+
+@functools.lru_cache(maxsize=4096)
+def config_key(config, kind="exit_velocity", **options):
+    """Canonical hash of a SprayConfig plus solver options (e.g. rtol, atol)."""
+    payload = {"version": CACHE_VERSION, "kind": kind, "config": asdict(config), "options": options}
+    return hashlib.sha256(json.dumps(_canonical(payload), sort_keys=True).encode()).hexdigest()
+
+class ResultCache:
+    """SQLite-backed key -> JSON value store with a row cap and LRU eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+
+    def _connect(self):
+        # One short-lived connection per call: safe across Streamlit session threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    @instrumented("ResultCache.get_many")
+    def get_many(self, keys):
+        """Cached values for the keys that are present, as {key: value}."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = conn.execute(f"SELECT key, value FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((key, json.loads(value)) for key, value in rows)
+            if found:
+                conn.executemany("UPDATE results SET last_used = ? WHERE key = ?", [(time.time(), key) for key in found])
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'hits'", (len(found),))
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'misses'", (len(keys) - len(found),))
+        return found
+
+    @instrumented("ResultCache.put_many")
+    def put_many(self, items):
+        """Store {key: value} pairs (values must be JSON serializable) and evict if over the cap."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", [(key, json.dumps(value), now) for key, value in items.items()])
+            excess = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)", (excess,))
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def stats(self):
+        """Shared hit/miss counters and current number of entries."""
+        with self._connect() as conn:
+            stats = dict(conn.execute("SELECT name, value FROM counters"))
+            stats["entries"] = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return stats
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+            conn.execute("UPDATE counters SET value = 0")
+
+@functools.lru_cache(maxsize=None)
+def get_cache(path=DEFAULT_CACHE_PATH):
+    return ResultCache(path)
+
+def cached_solve_particle(config, profile="preview", method=None, cache=None):
+    """solve_particle through the result cache; returns a SolveReport."""
+    cache = cache or get_cache()
+    key = config_key(config, kind="solve_particle", profile=profile, method=method)
+    stored = cache.get(key)
+    if stored is None:
+        report = solve_particle(config, profile, method)
+        stored = {name: value.tolist() if isinstance(value, np.ndarray) else value for name, value in asdict(report).items()}
+        cache.put(key, stored)
+    return SolveReport(**{name: np.array(value) if isinstance(value, list) else value for name, value in stored.items()})
+
+def cached_nozzle_profiles(config, profile="standard", method=None, n_points=200, cache=None):
+    """solve_nozzle_profiles through the result cache; returns a dict of arrays."""
+    cache = cache or get_cache()
+    key = config_key(config, kind="nozzle_profiles", profile=profile, method=method, n_points=n_points)
+    stored = cache.get(key)
+    if stored is None:
+        stored = {name: value.tolist() for name, value in solve_nozzle_profiles(config, n_points, profile, method).items()}
+        cache.put(key, stored)
+    return {name: np.array(value) for name, value in stored.items()}
+
+def cached_sensitivities(config, cache=None):
+    """solve_sensitivities through the result cache; returns a SensitivityReport."""
+    cache = cache or get_cache()
+    key = config_key(config, kind="sensitivities")
+    stored = cache.get(key)
+    if stored is None:
+        stored = asdict(solve_sensitivities(config))
+        cache.put(key, stored)
+    return SensitivityReport(**stored)
+
+def cached_exit_velocity_batch(configs, cache=None, rtol=1e-6, atol=1e-6):
+    """Exit velocities for a batch of configs; only the cache misses are solved, as one batch (split across the solver_pool workers, if enabled)."""
+    cache = cache or get_cache()
+    keys = [config_key(c, kind="exit_velocity_batch", rtol=rtol, atol=atol) for c in configs]
+    found = cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    if missing:
+        solved = solve_exit_velocity_parallel([configs[i] for i in missing], rtol=rtol, atol=atol)
+        new = {keys[i]: float(vp) for i, vp in zip(missing, solved)}
+        cache.put_many(new)
+        found.update(new)
+    return np.array([found[key] for key in keys])
+
+def cached_exit_state_batch(configs, cache=None, rtol=1e-6, atol=1e-6):
+    """Exit velocities and temperatures (K) for a batch of configs, as two arrays; only the cache misses are solved."""
+    cache = cache or get_cache()
+    keys = [config_key(c, kind="exit_state_batch", rtol=rtol, atol=atol) for c in configs]
+    found = cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    if missing:
+        solved = solve_exit_state_parallel([configs[i] for i in missing], rtol=rtol, atol=atol)
+        new = {keys[i]: [float(vp), float(Tp)] for i, (vp, Tp) in zip(missing, solved)}
+        cache.put_many(new)
+        found.update(new)
+    vp, Tp = np.array([found[key] for key in keys], dtype=float).reshape(-1, 2).T
+    return vp, Tp
@@ -0,0 +1,129 @@
+"""
+Lightweight counters and timers for the particle velocity solver.
+
+Instrumented functions add their calls, cumulative wall time and root-finder
+iterations to the collector of the current context. A collector is opened per
+Streamlit rerun with start(), or around any block with collect(). Streamlit runs
+every session in its own thread, so concurrent reruns never mix their numbers.
+When no collector is open, an instrumented function costs one context-variable
+lookup per call. Work done in solver_pool worker processes is not recorded.
+Opening a collector with start() also makes sure its log() line is written:
+the "coldspray.solver" logger is set to INFO unless it has a level, and gets a
+stderr handler unless it or one of its ancestors has a handler already.
+"""
+import json
+import time
+import logging
+import functools
+import contextlib
+import contextvars
+
+logger = logging.getLogger("coldspray.solver")
+
+_collector = contextvars.ContextVar("solver_metrics", default=None)
+
+def enable_logging():
+    """
+    Log the solver_metrics lines at INFO level (an explicitly set level is kept).
+    They go to stderr only if neither this logger nor its ancestors have a handler.
+    """
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    if logger.hasHandlers():
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s")) # One JSON object per line
+    logger.addHandler(handler)
+
+class SolverMetrics:
+    """Per-function calls, inclusive wall time (s) and root-finder iterations."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls = {}
+        self.seconds = {}
+        self.iterations = {}
+
+    def add(self, name, seconds, calls=1):
+        self.calls[name] = self.calls.get(name, 0) + calls
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def add_iterations(self, name, n):
+        self.iterations[name] = self.iterations.get(name, 0) + n
+
+    def rows(self):
+        """One dict per function, slowest first. Times are inclusive of nested instrumented calls."""
+        names = sorted(set(self.calls) | set(self.iterations), key=lambda name: -self.seconds.get(name, 0.0))
+        return [{
+            "function": name,
+            "calls": self.calls.get(name, 0),
+            "total_ms": 1e3 * self.seconds.get(name, 0.0),
+            "us_per_call": 1e6 * self.seconds.get(name, 0.0) / max(self.calls.get(name, 0), 1),
+            "iterations": self.iterations.get(name, 0),
+        } for name in names]
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def log(self, **context):
+        """Emit one structured (JSON) log line with the totals and the given context fields."""
+        functions = {row.pop("function"): {key: round(value, 3) for key, value in row.items()} for row in self.rows()}
+        logger.info(json.dumps({"event": "solver_metrics", **context, "wall_ms": round(1e3 * self.elapsed(), 3), "functions": functions}))
+
+def start(enabled=True):
+    """
+    Open a fresh collector for the current context (e.g. one Streamlit rerun),
+    replacing any previous one. Returns it, or None when disabled.
+    """
+    metrics = SolverMetrics() if enabled else None
+    if enabled:
+        enable_logging()
+    _collector.set(metrics)
+    return metrics
+
+@contextlib.contextmanager
+def collect():
+    """Collect the metrics of the enclosed block: with collect() as metrics: ..."""
+    metrics = SolverMetrics()
+    token = _collector.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _collector.reset(token)
+
+def instrumented(name=None):
+    """Decorator recording calls and cumulative time of a function while a collector is open."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = _collector.get()
+            if metrics is None:
+                return func(*args, **kwargs)
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.add(label, time.perf_counter() - start_time)
+        return wrapper
+    return decorator
+
+def count_iterations(name, n=1):
+    """Add root-finder iterations to a function's counter while a collector is open."""
+    metrics = _collector.get()
+    if metrics is not None:
+        metrics.add_iterations(name, n)
+
+@contextlib.contextmanager
+def timer(name):
+    """Time a block (e.g. plotting) like an instrumented function."""
+    metrics = _collector.get()
+    if metrics is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - start_time)
@@ -0,0 +1,110 @@
+"""
+Opt-in multi-process execution of particle-velocity solves.
+
+Solves run serially in the calling process unless COLDSPRAY_WORKERS is set to
+the number of worker processes to use. Batches are then split into contiguous
+chunks that run on a process pool. The pool is created once per server process
+and kept warm, so reruns do not pay the worker start-up cost again. Small
+batches, or machines with a single core, still run serially. Results always
+come back in the input order.
+"""
+import os
+import atexit
+import logging
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from particle_solver import solve_exit_velocity_batch, solve_exit_state_batch
+
+# Tunables: a batch goes to the pool only if every worker gets at least
+# PARALLEL_MIN_CHUNK points. They are a conservative guess, not a measured
+# break-even point; re-measure with the pool_benchmarks of
+# benchmarks/particle_velocity.py on the deployment machine before changing them.
+# The page's adaptive sweeps (9-20 points) always run serially; large batches
+# such as spray-window grids and Monte Carlo samples can reach the pool.
+PARALLEL_MIN_CHUNK = 100
+PARALLEL_MIN_BATCH = 2 * PARALLEL_MIN_CHUNK
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def worker_count():
+    """
+    Number of pool workers: COLDSPRAY_WORKERS, capped at the core count, read
+    once per process. 1 (serial) when unset or not an integer.
+    """
+    value = os.environ.get("COLDSPRAY_WORKERS", "1")
+    try:
+        workers = int(value)
+    except ValueError:
+        logger.warning("COLDSPRAY_WORKERS=%r is not an integer, solving serially", value)
+        workers = 1
+    return max(min(workers, os.cpu_count() or 1), 1)
+
+def get_executor():
+    """Shared process pool, created on first use. Workers are spawned rather than
+    forked, because the Streamlit server process is multi-threaded."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=worker_count(), mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+atexit.register(shutdown_executor)
+
+def split_chunks(items, n_chunks):
+    """Split a sequence into n_chunks contiguous, nearly equal chunks (order preserved)."""
+    bounds = np.linspace(0, len(items), n_chunks + 1).round().astype(int)
+    return [items[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+def map_chunks(func, items, *args, min_batch=PARALLEL_MIN_BATCH, min_chunk=PARALLEL_MIN_CHUNK):
+    """
+    Apply func(chunk, *args) to contiguous chunks of items on the process pool and
+    concatenate the results in order. func must be a module-level function that
+    returns one result per item. Falls back to a single serial call for batches
+    smaller than min_batch, when only one worker is available, or if the pool dies.
+    """
+    items = list(items)
+    n_chunks = min(worker_count(), len(items) // max(min_chunk, 1))
+    if len(items) < min_batch or n_chunks < 2:
+        return list(func(items, *args))
+
+    try:
+        futures = [get_executor().submit(func, chunk, *args) for chunk in split_chunks(items, n_chunks)]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+    except BrokenProcessPool:
+        shutdown_executor()
+        return list(func(items, *args))
+
+def _exit_velocity_chunk(configs, rtol, atol):
+    return solve_exit_velocity_batch(configs, rtol=rtol, atol=atol)[0]
+
+def solve_exit_velocity_parallel(configs, rtol=1e-6, atol=1e-6, min_batch=PARALLEL_MIN_BATCH):
+    """Exit velocities for a batch of configs, split across the process pool when large enough."""
+    return np.array(map_chunks(_exit_velocity_chunk, configs, rtol, atol, min_batch=min_batch))
+
+def _exit_state_chunk(configs, rtol, atol):
+    vp, Tp, _ = solve_exit_state_batch(configs, rtol=rtol, atol=atol)
+    return list(zip(vp, Tp))
+
+def solve_exit_state_parallel(configs, rtol=1e-6, atol=1e-6, min_batch=PARALLEL_MIN_BATCH):
+    """Exit velocities and temperatures (K, NaN without a specific heat) of a batch, as an (n, 2) array."""
+    return np.array(map_chunks(_exit_state_chunk, configs, rtol, atol, min_batch=min_batch)).reshape(-1, 2)
@@ -0,0 +1,41 @@
+"""
+Spray window: particle exit velocity against the critical velocity over a 2D
+grid of two process parameters.
+
+The exit velocities (and, with particle heating, the impact temperatures) of the
+whole grid come from one cached batch. The critical velocity models are then
+evaluated on the same grid, so the deposition window is where the ratio
+eta = vp / vcr is at least 1.
+"""
+import numpy as np
+
+import critical_velocity as cv
+from particle_solver import with_parameter, get_parameter
+from solver_cache import cached_exit_velocity_batch, cached_exit_state_batch
+
+WINDOW_PARAMETERS = ("P0", "T0", "dp", "Lf", "v0")
+
+def exit_state_grid(config, x_name, X, y_name, Y):
+    """
+    Exit velocity and temperature (K, NaN without particle heating) with
+    x_name = X and y_name = Y, as an array of shape X.shape + (2,).
+    """
+    configs = [with_parameter(with_parameter(config, x_name, x), y_name, y) for x, y in zip(np.ravel(X), np.ravel(Y))]
+    if config.particle.thermal:
+        vp, Tp = cached_exit_state_batch(configs)
+    else:
+        vp, Tp = cached_exit_velocity_batch(configs), np.full(len(configs), np.nan)
+    return np.stack([vp, Tp], axis=-1).reshape(*np.shape(X), 2)
+
+def velocity_ratio(config, material_name, x_name, X, y_name, Y, state):
+    """
+    eta = vp / vcr on the grid for every critical velocity model, keyed by
+    CRITICAL_VELOCITY_MODELS. state is exit_state_grid's result. The particle
+    diameter is taken from the grid if it is one of its axes, and the impact
+    temperature from state when particle heating is on (else the material default).
+    """
+    grid = {x_name: X, y_name: Y}
+    dp = grid.get("dp", get_parameter(config, "dp"))
+    vp, Tp = state[..., 0], state[..., 1]
+    vcr = cv.critical_velocities(material_name, np.broadcast_to(dp, vp.shape) * 1e6, Tp=None if np.isnan(Tp).all() else Tp - 273.15)
+    return {model: vp / v for model, v in vcr.items()}
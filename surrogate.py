@@ -0,0 +1,176 @@
+"""
+Precomputed surrogate of the exit particle velocity for live previews.
+
+For a linear nozzle, the particle ODE depends on the eight inputs only through
+five similarity coordinates: T0, v0, log(De/Dnt), log(P0*dp) (Reynolds number
+scale) and log(Lf*P0/(rho_p*dp)) (drag loading). Dnt, De, P0, dp, rho_p and Lf
+only enter through these combinations. The ratio of exit particle velocity to
+exit gas velocity is tabulated per gas on a tensor grid of Chebyshev-Lobatto
+nodes in those coordinates, solved with the real batched solver, and evaluated
+by barycentric interpolation in well under a millisecond.
+
+The table ships as exit_velocity_surrogate.npz (~0.5 MB), together with the
+largest error measured on an independent quasi-random validation sample of the
+validated domain (SURROGATE_DOMAIN) and the solver_cache.CACHE_VERSION it was
+built with. A table of another version is not loaded, so bumping CACHE_VERSION
+after a physics change disables the live preview until the table is rebuilt:
+
+    python surrogate.py
+"""
+import os
+import sys
+import time
+import functools
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.stats import qmc
+
+from solver_cache import CACHE_VERSION
+from particle_solver import (GAS_DB, DEFAULT_DRAG_MODEL, GasConfig, ParticleConfig, NozzleConfig, SprayConfig,
+                             mach_from_area_ratio, get_parameter, solve_exit_velocity_batch)
+
+SURROGATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exit_velocity_surrogate.npz")
+# Validated domain in SI units: the ranges of the sidebar sliders
+SURROGATE_DOMAIN = {
+    "P0": (5e5, 60e5), "T0": (573.0, 1373.0), "dp": (1e-6, 100e-6), "rho_p": (1000.0, 20000.0),
+    "Dnt": (1e-3, 4e-3), "De": (4e-3, 20e-3), "Lf": (40e-3, 300e-3), "v0": (10.0, 300.0),
+}
+# Chebyshev nodes along T0, v0, log(De/Dnt), log(P0*dp) and log(Lf*P0/(rho_p*dp)).
+# The ratio is smooth in T0, v0 and the Reynolds number scale: a (5, 5, 17, 25, 25)
+# grid, 8 times larger, lowered the largest validation error by at most 3.2 m/s.
+SURROGATE_NODES = (3, 3, 17, 9, 25)
+SURROGATE_VALIDATION_POINTS = 4096
+SURROGATE_BUILD_CHUNK = 4000 # Nodes per batched solve
+
+def similarity_coordinates(P0, T0, dp, rho_p, Dnt, De, Lf, v0):
+    """The five coordinates the exit velocity depends on (arguments broadcast)."""
+    return np.stack(np.broadcast_arrays(T0, v0, np.log(De / Dnt), np.log(P0 * dp), np.log(Lf * P0 / (rho_p * dp))), axis=-1)
+
+def coordinate_bounds(domain=SURROGATE_DOMAIN):
+    """Box in similarity coordinates that covers the input domain."""
+    corners = np.array(list(itertools.product(*domain.values())))
+    coords = similarity_coordinates(*corners.T)
+    return np.c_[coords.min(axis=0), coords.max(axis=0)]
+
+def exit_gas_velocity(area_ratio, gamma, R, T0):
+    M = mach_from_area_ratio(area_ratio, gamma)
+    return M * np.sqrt(gamma * R * T0 / (1 + (gamma - 1) / 2 * M**2))
+
+def chebyshev_nodes(lo, hi, n):
+    return (lo + hi) / 2 + (hi - lo) / 2 * np.cos(np.pi * np.arange(n) / (n - 1))
+
+#Barycentric interpolation weights of a coordinate value on Chebyshev-Lobatto nodes
+def barycentric_row(value, nodes):
+    w = (-1.0) ** np.arange(len(nodes))
+    w[0] *= 0.5
+    w[-1] *= 0.5
+    diff = value - nodes
+    hit = np.flatnonzero(np.abs(diff) <= 1e-14 * max(abs(value), 1.0))
+    if len(hit):
+        row = np.zeros(len(nodes))
+        row[hit[0]] = 1.0
+        return row
+    q = w / diff
+    return q / q.sum()
+
+@dataclass(frozen=True, eq=False)
+class ExitVelocitySurrogate:
+    gas_names: tuple
+    gamma: np.ndarray # Per gas
+    R: np.ndarray # Per gas
+    bounds: np.ndarray # (5, 2) similarity-coordinate box of the nodes
+    tables: np.ndarray # (gas, *SURROGATE_NODES) exit velocity / exit gas velocity
+    max_error: np.ndarray # Largest validation error per gas (m/s)
+
+    def gas_index(self, gas):
+        match = np.flatnonzero((self.gamma == gas.gamma) & (self.R == gas.R))
+        return int(match[0]) if len(match) else None
+
+    def covers(self, config):
+        """True for velocity-only, linear-nozzle configs of a tabulated gas inside SURROGATE_DOMAIN, with the default drag correlation."""
+        if config.drag != DEFAULT_DRAG_MODEL or config.particle.thermal or config.nozzle.expression or config.nozzle.profile or self.gas_index(config.gas) is None:
+            return False
+        return all(lo <= get_parameter(config, name) <= hi for name, (lo, hi) in SURROGATE_DOMAIN.items())
+
+    def error_bound(self, config):
+        return float(self.max_error[self.gas_index(config.gas)])
+
+    def predict(self, config):
+        """Exit particle velocity (m/s) of a config the surrogate covers."""
+        gas, particle, nozzle = config.gas, config.particle, config.nozzle
+        coords = similarity_coordinates(gas.P0, gas.T0, particle.dp, particle.rho_p, nozzle.Dnt, nozzle.De, nozzle.Lf, particle.v0)
+        ratio = self.tables[self.gas_index(gas)]
+        for (lo, hi), n, value in zip(self.bounds, ratio.shape, coords):
+            ratio = np.tensordot(barycentric_row(value, chebyshev_nodes(lo, hi, n)), ratio, axes=(0, 0))
+        return float(ratio * exit_gas_velocity((nozzle.De / nozzle.Dnt)**2, gas.gamma, gas.R, gas.T0))
+
+@functools.lru_cache(maxsize=None)
+def load_surrogate(path=SURROGATE_PATH):
+    """
+    The shipped surrogate, or None if the artifact is missing or was built for
+    another CACHE_VERSION of the solver (callers fall back to the solver).
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if "version" not in data or int(data["version"]) != CACHE_VERSION:
+            return None
+        return ExitVelocitySurrogate(
+            gas_names=tuple(data["gas_names"].tolist()),
+            gamma=data["gamma"], R=data["R"], bounds=data["bounds"],
+            tables=data["tables"].astype(float), max_error=data["max_error"],
+        )
+
+def _solve_inputs(gas, inputs, order=None):
+    # Rows of (P0, T0, dp, rho_p, Dnt, De, Lf, v0); solved in chunks of similar
+    # drag loading, since the stiffest point of a batch sets its step size
+    order = np.argsort(inputs[:, 3] * inputs[:, 2] / (inputs[:, 6] * inputs[:, 0])) if order is None else order
+    vp = np.empty(len(inputs))
+    for chunk in np.array_split(order, max(len(order) // SURROGATE_BUILD_CHUNK, 1)):
+        configs = [SprayConfig(GasConfig(gas["Gamma"], gas["R"], P0, T0), ParticleConfig(rho_p, dp, v0), NozzleConfig(Dnt, De, Lf))
+                   for P0, T0, dp, rho_p, Dnt, De, Lf, v0 in inputs[chunk]]
+        vp[chunk] = solve_exit_velocity_batch(configs)[0]
+    return vp
+
+def build_surrogate(path=SURROGATE_PATH, nodes=SURROGATE_NODES, n_validation=SURROGATE_VALIDATION_POINTS, seed=0):
+    """Tabulate every gas in GAS_DB, validate it against the solver and write the artifact."""
+    bounds = coordinate_bounds()
+    axes = [chebyshev_nodes(lo, hi, n) for (lo, hi), n in zip(bounds, nodes)]
+    T0, v0, log_er, log_re, log_k = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 5).T
+    # Any inputs with the node's coordinates give the same exit velocity; fix P0, Dnt and Lf
+    P0, Dnt, Lf = 30e5, 1.5e-3, 0.1
+    dp = np.exp(log_re) / P0
+    nodes_inputs = np.c_[np.full_like(T0, P0), T0, dp, Lf * P0 / (dp * np.exp(log_k)), np.full_like(T0, Dnt), Dnt * np.exp(log_er), np.full_like(T0, Lf), v0]
+
+    # Validation inputs: quasi-random, log-uniform except v0, over the input domain
+    lo, hi = np.array(list(SURROGATE_DOMAIN.values())).T
+    log_scale = np.array([name != "v0" for name in SURROGATE_DOMAIN])
+    lo_t, hi_t = np.where(log_scale, np.log(lo), lo), np.where(log_scale, np.log(hi), hi)
+    u = qmc.Sobol(len(lo), scramble=True, seed=seed).random(n_validation)
+    validation = lo_t + u * (hi_t - lo_t)
+    validation = np.where(log_scale, np.exp(validation), validation)
+
+    tables, max_error = [], []
+    for gas_name, gas in GAS_DB.items():
+        start = time.perf_counter()
+        vp = _solve_inputs(gas, nodes_inputs)
+        tables.append((vp / exit_gas_velocity(np.exp(2 * log_er), gas["Gamma"], gas["R"], T0)).reshape(nodes))
+        surrogate = ExitVelocitySurrogate((gas_name,), np.array([gas["Gamma"]]), np.array([gas["R"]]), bounds, tables[-1][None], np.zeros(1))
+        vp_exact = _solve_inputs(gas, validation)
+        vp_surrogate = np.array([surrogate.predict(SprayConfig(GasConfig(gas["Gamma"], gas["R"], P0_, T0_), ParticleConfig(rho_p_, dp_, v0_), NozzleConfig(Dnt_, De_, Lf_)))
+                                 for P0_, T0_, dp_, rho_p_, Dnt_, De_, Lf_, v0_ in validation])
+        error = np.abs(vp_surrogate - vp_exact)
+        max_error.append(error.max())
+        print(f"{gas_name}: {len(vp)} nodes in {time.perf_counter() - start:.0f} s, validation error max {error.max():.2f} m/s, 99th percentile {np.percentile(error, 99):.2f} m/s")
+
+    np.savez_compressed(
+        path, version=CACHE_VERSION, gas_names=np.array(list(GAS_DB)), gamma=np.array([g["Gamma"] for g in GAS_DB.values()]),
+        R=np.array([g["R"] for g in GAS_DB.values()]), bounds=bounds,
+        tables=np.array(tables, dtype=np.float32), max_error=np.array(max_error),
+    )
+    load_surrogate.cache_clear()
+
+if __name__ == "__main__":
+    build_surrogate(*sys.argv[1:2])
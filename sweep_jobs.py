@@ -0,0 +1,148 @@
+"""
+Background, progressive parameter sweeps for the particle velocity page.
+
+The exit velocity is smooth in almost every parameter, so sweeps are sampled
+adaptively: a coarse grid first, then only the intervals where the curve is not
+yet resolved to the tolerance are bisected. A SweepJob runs such a sweep in a
+daemon thread, so a chart can be drawn from the partial results while the rest is
+computed. A GridJob does the same for a 2D grid, refining a coarse grid level by
+level; every level contains the points of the previous one, so with a result
+cache only the new points are solved. Jobs never call Streamlit; the page polls
+them.
+"""
+import threading
+
+import numpy as np
+
+SWEEP_COARSE_POINTS = 9 # Points of the first, evenly spaced level (endpoints included)
+SWEEP_TOLERANCE = 0.5 # Target linear-interpolation error of the sweep curve (m/s)
+SWEEP_MAX_POINTS = 200 # Solve budget of one sweep, the old fixed grid size
+SWEEP_POLL_INTERVAL = 0.3 # Seconds between chart refreshes while a job runs
+GRID_LEVELS = (9, 17, 33, 65) # Points per axis of the nested levels of a 2D grid job
+
+def refine_intervals(x, v, tol=SWEEP_TOLERANCE):
+    """
+    Indices i of the intervals [x[i], x[i+1]] whose linear-interpolation error
+    h²/8·|v''| exceeds tol, largest error first. v'' is the second divided
+    difference at the interval's end points, taking the larger of the two.
+    """
+    if len(x) < 3:
+        return np.arange(len(x) - 1)
+    h = np.diff(x)
+    d2 = np.abs(2 * np.diff(np.diff(v) / h) / (h[:-1] + h[1:]))
+    err = h**2 / 8 * np.maximum(np.r_[d2[0], d2], np.r_[d2, d2[-1]])
+    order = np.argsort(-err)
+    return order[err[order] > tol]
+
+def adaptive_sweep(evaluate, lo, hi, tol=SWEEP_TOLERANCE, n_initial=SWEEP_COARSE_POINTS, max_points=SWEEP_MAX_POINTS, on_level=None):
+    """
+    Sample v = evaluate(x) on [lo, hi], coarse first and then bisecting only the
+    intervals whose estimated interpolation error exceeds tol (m/s), until none
+    is left or max_points solves are used. evaluate takes an array of x and
+    returns an array, so every level is one batched solve. on_level(x, v) is
+    called with the sorted samples after each level.
+    Returns (x, v, n_solves).
+    """
+    x = np.linspace(lo, hi, n_initial)
+    v = np.asarray(evaluate(x), dtype=float)
+    if on_level:
+        on_level(x, v)
+    while len(x) < max_points:
+        idx = refine_intervals(x, v, tol)[:max_points - len(x)]
+        if not len(idx):
+            break
+        x_new = (x[idx] + x[idx + 1]) / 2
+        v_new = np.asarray(evaluate(x_new), dtype=float)
+        order = np.argsort(np.r_[x, x_new], kind="stable")
+        x, v = np.r_[x, x_new][order], np.r_[v, v_new][order]
+        if on_level:
+            on_level(x, v)
+    return x, v, len(x)
+
+class SweepCancelled(Exception):
+    pass
+
+class BackgroundJob:
+    """
+    Base of the sweep jobs: runs self.run(*args) in a daemon thread that the page
+    can cancel and poll. Subclasses set their result attributes before calling
+    __init__, publish partial results under self._lock and call
+    self.check_cancelled() between levels.
+    """
+
+    def __init__(self, *args):
+        self.error = None
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._main, args=args, daemon=True)
+        self._thread.start()
+
+    def _main(self, *args):
+        try:
+            self.run(*args)
+        except SweepCancelled:
+            pass
+        except Exception as e: # Surfaced by the page on its next poll
+            self.error = e
+
+    def run(self, *args):
+        raise NotImplementedError
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise SweepCancelled
+
+    def cancel(self):
+        """Stop before the next level; the level being solved still reaches the cache."""
+        self._cancel.set()
+
+    @property
+    def done(self):
+        return not self._thread.is_alive()
+
+class SweepJob(BackgroundJob):
+    """Adaptive sweep of evaluate over [lo, hi], computed level by level in a background thread."""
+
+    def __init__(self, evaluate, lo, hi, tol=SWEEP_TOLERANCE):
+        self.x = self.v = np.empty(0)
+        super().__init__(evaluate, lo, hi, tol)
+
+    def run(self, evaluate, lo, hi, tol):
+        def checked(x):
+            self.check_cancelled()
+            return evaluate(x)
+
+        def store(x, v):
+            with self._lock:
+                self.x, self.v = x, v
+
+        adaptive_sweep(checked, lo, hi, tol, on_level=store)
+
+    def snapshot(self):
+        """Sorted (x, v) samples so far."""
+        with self._lock:
+            return self.x, self.v
+
+class GridJob(BackgroundJob):
+    """
+    Evaluate V = evaluate(X, Y) on nested grids over [x_lo, x_hi] x [y_lo, y_hi]
+    in a background thread, coarse first. evaluate takes the meshgrid arrays
+    (indexing="ij") and returns an array whose leading dimensions match them.
+    """
+
+    def __init__(self, evaluate, x_lo, x_hi, y_lo, y_hi, levels=GRID_LEVELS):
+        self.x = self.y = self.v = None
+        super().__init__(evaluate, x_lo, x_hi, y_lo, y_hi, levels)
+
+    def run(self, evaluate, x_lo, x_hi, y_lo, y_hi, levels):
+        for n in levels:
+            self.check_cancelled()
+            x, y = np.linspace(x_lo, x_hi, n), np.linspace(y_lo, y_hi, n)
+            v = np.asarray(evaluate(*np.meshgrid(x, y, indexing="ij")), dtype=float)
+            with self._lock:
+                self.x, self.y, self.v = x, y, v
+
+    def snapshot(self):
+        """(x, y, V) of the finest level finished so far, or None before the first."""
+        with self._lock:
+            return None if self.v is None else (self.x, self.y, self.v)
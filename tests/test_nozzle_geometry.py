@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from particle_solver import NozzleConfig
+
+@pytest.mark.parametrize("expression", [
+    "1.5*L/(L-x)", # Pole at the exit
+    "log(x)", # -inf at the throat
+    "sqrt(x - L)", # NaN at the throat
+    "exp(10*x)", # Overflows at the exit
+])
+def test_expression_with_non_finite_endpoint_is_rejected(expression):
+    with pytest.raises(ValueError):
+        NozzleConfig.from_expression(expression, 0.1)
+
+def test_expression_with_non_positive_endpoint_is_rejected():
+    with pytest.raises(ValueError):
+        NozzleConfig.from_expression("2 - 4*x/L", 0.1)
+
+def test_expression_with_removable_singularity_takes_the_limit():
+    # L/x is infinite at the throat, where the diameter tends to 1.5 mm
+    nozzle = NozzleConfig.from_expression("1.5 + 3.5/(1 + L/x)", 0.1)
+    assert nozzle.Dnt == pytest.approx(1.5e-3)
+    assert nozzle.De == pytest.approx(3.25e-3)
+
+def test_expression_endpoints():
+    nozzle = NozzleConfig.from_expression("2 + 4*x/L", 0.1)
+    assert nozzle.Dnt == pytest.approx(2e-3)
+    assert nozzle.De == pytest.approx(6e-3)
+    assert isinstance(nozzle.De, float)
+
+@pytest.mark.parametrize("x, D", [
+    ([0.0], [1.5e-3]), # One station
+    ([0.0, 0.05, np.nan], [1.5e-3, 3e-3, 5e-3]), # Non-finite x
+    ([0.0, 0.05, 0.1], [1.5e-3, np.inf, 5e-3]), # Non-finite D
+    ([0.0, 0.1, 0.05], [1.5e-3, 5e-3, 3e-3]), # x not increasing
+    ([0.0, 0.05, 0.05, 0.1], [1.5e-3, 3e-3, 3e-3, 5e-3]), # Repeated station
+    ([0.0, 0.05, 0.1], [1.5e-3, 0.0, 5e-3]), # Zero diameter
+    ([0.0, 0.05, 0.1], [-1.5e-3, 3e-3, 5e-3]), # Negative diameter
+    ([0.0, 0.05, 0.1], [1.5e-3, 5e-3]), # Mismatched lengths
+])
+def test_invalid_profile_is_rejected(x, D):
+    with pytest.raises(ValueError):
+        NozzleConfig.from_profile(x, D)
+
+def test_profile_starts_at_the_throat():
+    nozzle = NozzleConfig.from_profile([0.01, 0.06, 0.11], [1.5e-3, 3e-3, 5e-3])
+    assert (nozzle.Dnt, nozzle.De, nozzle.Lf) == pytest.approx((1.5e-3, 5e-3, 0.1))
+    assert nozzle.profile[0] == (0.0, 1.5e-3)
@@ -0,0 +1,62 @@
+"""
+Monte Carlo propagation of input scatter to the exit particle velocity.
+
+Inputs are drawn as a quasi-random (scrambled Sobol or Latin hypercube) sample
+and mapped through each input's distribution. The whole sample is then solved as
+one batch through the result cache, so rerunning the same study costs one cache
+lookup. Seeds are fixed, so equal inputs always draw the same sample.
+"""
+import numpy as np
+from scipy import stats
+from scipy.stats import qmc
+
+from particle_solver import with_parameter, get_parameter
+from solver_cache import cached_exit_velocity_batch
+
+UNCERTAIN_PARAMETERS = ("P0", "T0", "dp", "rho_p")
+SAMPLING_METHODS = ("Sobol", "Latin hypercube")
+INPUT_DISTRIBUTIONS = ("Normal", "Uniform")
+MC_PERCENTILES = (5, 50, 95)
+
+def sample_unit(n, d, method="Sobol", seed=0):
+    """n quasi-random points in the unit cube [0, 1)^d. Sobol samples are rounded up to a power of two."""
+    if method == "Sobol":
+        return qmc.Sobol(d, scramble=True, seed=seed).random_base2(int(np.ceil(np.log2(max(n, 2)))))
+    return qmc.LatinHypercube(d, seed=seed).random(n)
+
+def sample_inputs(config, spreads, n=2048, method="Sobol", seed=0):
+    """
+    Input samples around config. spreads maps a parameter name to (distribution,
+    spread) in SI units: the standard deviation of a Normal input or the
+    half-width of a Uniform one, centred on the value in config. Samples are
+    kept positive. Returns {name: array}.
+    """
+    names = list(spreads)
+    u = sample_unit(n, len(names), method, seed)
+    samples = {}
+    for k, name in enumerate(names):
+        distribution, spread = spreads[name]
+        centre = get_parameter(config, name)
+        if distribution == "Normal":
+            values = stats.norm.ppf(u[:, k], loc=centre, scale=spread)
+        else:
+            values = centre + spread * (2 * u[:, k] - 1)
+        samples[name] = np.maximum(values, 1e-3 * centre)
+    return samples
+
+def monte_carlo_exit_velocity(config, spreads, n=2048, method="Sobol", seed=0):
+    """Input samples (see sample_inputs) and the exit velocity of every sample, solved as one cached batch."""
+    samples = sample_inputs(config, spreads, n, method, seed)
+    configs = []
+    for i in range(len(next(iter(samples.values())))):
+        sample = config
+        for name, values in samples.items():
+            sample = with_parameter(sample, name, values[i])
+        configs.append(sample)
+    return samples, cached_exit_velocity_batch(configs)
+
+def summarize(vp):
+    """Mean, standard deviation and MC_PERCENTILES of a sample of exit velocities."""
+    summary = {"mean": float(np.mean(vp)), "std": float(np.std(vp, ddof=1))}
+    summary.update({f"p{q}": float(p) for q, p in zip(MC_PERCENTILES, np.percentile(vp, MC_PERCENTILES))})
+    return summary